@@ -9,6 +9,8 @@ Based on Pi Agent Framework philosophy:
 """
 
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Dict, List, Optional
 
 from dotenv import load_dotenv
@@ -48,6 +50,7 @@ def call_llm(
     max_tokens: int = 4096,
     prompt: Optional[str] = None,
     images: Optional[List[str]] = None,
+    image_urls: Optional[List[str]] = None,
 ) -> Dict[str, Any]:
     """
     Call Claude LLM with messages and tools.
@@ -64,6 +67,9 @@ def call_llm(
         max_tokens: Maximum tokens in response
         prompt: Simple text prompt (auto-constructs messages if provided)
         images: Optional list of base64-encoded PNG strings for vision analysis
+        image_urls: Optional list of image URLs (e.g. signed GCS URLs) -
+            referenced images skip the base64 inflation and the 5 MB
+            base64 size cap entirely
 
     Returns:
         Dict with keys:
@@ -78,6 +84,15 @@ def call_llm(
     # Auto-construct messages from prompt + images if provided
     if messages is None and prompt is not None:
         content = []
+        if image_urls:
+            for url in image_urls:
+                content.append({
+                    "type": "image",
+                    "source": {
+                        "type": "url",
+                        "url": url,
+                    }
+                })
         if images:
             for img in images:
                 content.append({
@@ -138,6 +153,72 @@ def call_llm(
     return result
 
 
+def call_llm_many(
+    prompts: List[str],
+    images_list: Optional[List[Optional[List[str]]]] = None,
+    system_prompt: str = "You are a helpful medical analysis assistant.",
+    model: str = "claude-sonnet-4-5-20250929",
+    max_tokens: int = 4096,
+    max_concurrency: int = 4,
+    stagger_seconds: float = 0.25,
+) -> List[Dict[str, Any]]:
+    """
+    Issue several independent vision/text requests concurrently.
+
+    Dispatch goes through a small thread pool with a short stagger
+    between submissions, so in-flight requests pipeline through the
+    upload, server-side decode, and inference phases instead of hitting
+    the API in lockstep and contending at each phase.
+
+    Args:
+        prompts: One text prompt per request
+        images_list: Optional per-request image lists (base64 PNGs),
+            aligned with prompts; None entries mean text-only
+        system_prompt: System prompt shared by all requests
+        model: Model identifier
+        max_tokens: Maximum tokens per response
+        max_concurrency: Maximum requests in flight at once
+        stagger_seconds: Delay between successive submissions
+
+    Returns:
+        List of call_llm result dicts aligned with the input order; a
+        failed request yields {"error": ...} instead of raising, so one
+        failure does not abort the batch
+    """
+    if not prompts:
+        return []
+    if images_list is None:
+        images_list = [None] * len(prompts)
+
+    results: List[Dict[str, Any]] = [{} for _ in prompts]
+    with ThreadPoolExecutor(max_workers=min(max_concurrency, len(prompts))) as executor:
+        futures = []
+        for i, (prompt, images) in enumerate(zip(prompts, images_list)):
+            if i:
+                time.sleep(stagger_seconds)
+            futures.append(executor.submit(
+                call_llm,
+                prompt=prompt,
+                images=images,
+                system_prompt=system_prompt,
+                model=model,
+                max_tokens=max_tokens,
+            ))
+
+        for i, future in enumerate(futures):
+            try:
+                results[i] = future.result()
+            except Exception as e:
+                results[i] = {
+                    "content": "",
+                    "content_blocks": [],
+                    "tool_calls": [],
+                    "error": str(e),
+                }
+
+    return results
+
+
 # ============================================================================
 # CONVENIENCE FUNCTIONS
 # ============================================================================
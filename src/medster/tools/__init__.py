@@ -16,10 +16,16 @@ REMOVED: run_analysis (exec-based code generation)
 - Document analysis now uses dedicated safe tools
 """
 
+import inspect
+import mmap
 import re
 import json
+import tempfile
+from collections import OrderedDict
 from typing import Any, Dict, List, Optional
 
+import numpy as np
+
 # Import the underlying implementations (we'll wrap them)
 from medster.tools.medical.patient_data import (
     list_patients as _list_patients,
@@ -44,6 +50,18 @@ from medster.tools.analysis.vision_analyzer import (
 )
 
 
+# Section terminator: line starting with a capitalized word followed by a colon
+# (e.g. "Assessment:"). Compiled once - this runs per line in a hot loop.
+_SECTION_HDR_RE = re.compile(r'^[A-Z][A-Za-z\s]+:')
+
+# Potential section headers for document previews: a short line ending with a
+# colon, or a short ALL CAPS line. One multiline pattern replaces per-line
+# strip/endswith/isupper checks.
+_POTENTIAL_SECTION_RE = re.compile(
+    r'(?m)^[ \t]*(?:[A-Z][A-Z0-9 _\-]{3,48}|[^\n]{0,48}:)[ \t]*\r?$'
+)
+
+
 # ============================================================================
 # DOCUMENT CONTENT STORE
 # ============================================================================
@@ -53,10 +71,116 @@ from medster.tools.analysis.vision_analyzer import (
 
 _document_store: Dict[str, str] = {}
 
+# Per-document search index, keyed by content hash. Agent workflows hit the
+# same document with many search/extract calls across turns; preprocessing
+# the haystack once (split lines, lowered copy) makes repeated queries cheap
+# instead of re-deriving everything per call. Bounded LRU so large one-off
+# documents don't accumulate.
+_INDEX_CACHE_MAX = 8
+_document_index: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+
+# Memoized search_document results. Agents often repeat the exact same
+# query across reasoning turns; identical (content, terms, options) calls
+# return the previously computed dict instead of rescanning. Keyed by
+# content hash+length, so re-storing the same document keeps its entries
+# and different content can never alias.
+_SEARCH_CACHE_MAX = 256
+_search_result_cache: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+
+
+def _get_document_index(content: str) -> Dict[str, Any]:
+    """Get (or build) the cached search index for a document's content.
+
+    Fields are populated lazily by the tools that need them:
+    - "lines": content.split('\\n')
+    - "stripped_lines": lines with surrounding whitespace stripped
+    - "content_bytes" / "content_bytes_lower": utf-8 haystacks for
+      bytes-level scanning of ASCII documents
+    - "content_lower": lowercased str copy for non-ASCII content
+    - "newline_offsets" / "newline_offsets_lower": '\\n' positions for
+      offset -> line-number resolution via bisect
+    """
+    key = hash(content)
+    index = _document_index.get(key)
+    if index is None:
+        index = {}
+        _document_index[key] = index
+        while len(_document_index) > _INDEX_CACHE_MAX:
+            _document_index.popitem(last=False)
+    else:
+        _document_index.move_to_end(key)
+    return index
+
+
+def _get_lines(content: str, index: Optional[Dict[str, Any]] = None) -> List[str]:
+    """Split content into lines via the document index (cached)."""
+    if index is None:
+        index = _get_document_index(content)
+    lines = index.get("lines")
+    if lines is None:
+        lines = index["lines"] = content.split('\n')
+    return lines
+
+
+def _find_newline_offsets(text) -> np.ndarray:
+    """Positions of every '\\n' in text (str, bytes, or mmap) as a sorted
+    numpy array, for O(log N) offset -> line-number lookups via
+    searchsorted."""
+    if not isinstance(text, str):
+        arr = np.frombuffer(text, dtype=np.uint8)
+        return np.nonzero(arr == 0x0A)[0]
+    offsets = []
+    pos = text.find('\n')
+    while pos != -1:
+        offsets.append(pos)
+        pos = text.find('\n', pos + 1)
+    return np.asarray(offsets, dtype=np.int64)
+
+
+def line_number_for_offset(doc_id: str, offset: int) -> Optional[int]:
+    """Resolve a character offset in a stored document to a 1-based line
+    number, using the cached newline-offset array."""
+    content = _document_store.get(doc_id)
+    if content is None:
+        return None
+    index = _get_document_index(content)
+    offsets = index.get("newline_offsets")
+    if offsets is None:
+        offsets = index["newline_offsets"] = _find_newline_offsets(content)
+    return int(np.searchsorted(offsets, offset, side='right')) + 1
+
+
+# Documents above this size get their byte haystacks spilled to an
+# anonymous temp file and mmap'd, so repeated scans run against the OS page
+# cache instead of duplicating multi-MB buffers on the Python heap.
+_LARGE_DOC_THRESHOLD = 2 * 1024 * 1024
+
+
+def _mmap_bytes(data: bytes) -> mmap.mmap:
+    """Spill data to an unlinked temp file and return a read-only mmap."""
+    f = tempfile.TemporaryFile()
+    try:
+        f.write(data)
+        f.flush()
+        return mmap.mmap(f.fileno(), len(data), access=mmap.ACCESS_READ)
+    finally:
+        # The mapping keeps the (already unlinked) file alive.
+        f.close()
+
 
 def store_document(doc_id: str, content: str) -> None:
-    """Store a document for later searching."""
+    """Store a document for later searching and warm its search index."""
     _document_store[doc_id] = content
+    index = _get_document_index(content)
+    if len(content) > _LARGE_DOC_THRESHOLD and content.isascii():
+        # Large ASCII documents: mmap the scan buffers, build line lists
+        # lazily only if a tool actually needs them.
+        if "content_bytes" not in index:
+            data = content.encode('utf-8')
+            index["content_bytes"] = _mmap_bytes(data)
+            index["content_bytes_lower"] = _mmap_bytes(data.lower())
+    else:
+        _get_lines(content, index)
 
 
 def get_document(doc_id: str) -> Optional[str]:
@@ -300,7 +424,8 @@ def search_document(
         content: The document text to search
         search_terms: List of terms to search for (e.g., ["diabetes", "hypertension", "A1c"])
         case_sensitive: Whether search is case-sensitive (default: False)
-        context_lines: Number of lines before/after match to include (default: 1)
+        context_lines: Number of lines before/after match to include (default: 1).
+                      With 0, matches carry no "context" key at all.
         max_matches_per_term: Max matches to return per term (default: 10)
 
     Returns:
@@ -312,7 +437,17 @@ def search_document(
     if not search_terms:
         return {"error": "No search terms provided"}
 
-    lines = content.split('\n')
+    cache_key = (
+        hash(content), len(content), tuple(search_terms),
+        case_sensitive, context_lines, max_matches_per_term
+    )
+    cached = _search_result_cache.get(cache_key)
+    if cached is not None:
+        _search_result_cache.move_to_end(cache_key)
+        return cached
+
+    index = _get_document_index(content)
+    lines = _get_lines(content, index)
     results = {
         "document_stats": {
             "total_lines": len(lines),
@@ -321,27 +456,83 @@ def search_document(
         "matches": {}
     }
 
-    for term in search_terms:
-        term_matches = []
-        search_pattern = term if case_sensitive else term.lower()
+    # Scan one flat haystack with find() instead of looping over lines.
+    # For ASCII content (the common case for clinical text) the haystack is
+    # a cached utf-8 bytes copy - 1 byte per char versus Python's wide str
+    # buffer, so each scan moves a quarter of the memory. Non-ASCII content
+    # falls back to str scanning so unicode case folding stays correct.
+    # Either way, lowering happens once per document (cached), not once per
+    # line per term, and newline offsets are computed on the scanned buffer.
+    use_bytes = content.isascii()
+    if case_sensitive:
+        if use_bytes:
+            hay = index.get("content_bytes")
+            if hay is None:
+                hay = index["content_bytes"] = content.encode('utf-8')
+        else:
+            hay = content
+        offsets_field = "newline_offsets"
+    else:
+        if use_bytes:
+            hay = index.get("content_bytes_lower")
+            if hay is None:
+                raw = index.get("content_bytes")
+                if raw is None:
+                    raw = index["content_bytes"] = content.encode('utf-8')
+                hay = index["content_bytes_lower"] = raw.lower()
+        else:
+            hay = index.get("content_lower")
+            if hay is None:
+                hay = index["content_lower"] = content.lower()
+        offsets_field = "newline_offsets_lower"
 
-        for i, line in enumerate(lines):
-            search_line = line if case_sensitive else line.lower()
+    hay_offsets = index.get(offsets_field)
+    if hay_offsets is None:
+        hay_offsets = index[offsets_field] = _find_newline_offsets(hay)
 
-            if search_pattern in search_line:
-                # Get context lines
-                start_idx = max(0, i - context_lines)
-                end_idx = min(len(lines), i + context_lines + 1)
-                context = lines[start_idx:end_idx]
+    # Stripped lines are cached per document so strip() runs once per line
+    # per document, not once per match.
+    stripped_lines = index.get("stripped_lines")
+    if stripped_lines is None:
+        stripped_lines = index["stripped_lines"] = [line.strip() for line in lines]
 
-                term_matches.append({
+    for term in search_terms:
+        needle = term if case_sensitive else term.lower()
+        if use_bytes:
+            needle = needle.encode('utf-8')
+
+        # Collect matched line indices first; one match per line, matching
+        # the old per-line scan's behavior.
+        match_lines = []
+        pos = hay.find(needle)
+        while pos != -1 and len(match_lines) < max_matches_per_term:
+            i = int(np.searchsorted(hay_offsets, pos, side='right'))
+            match_lines.append(i)
+            line_end = int(hay_offsets[i]) if i < len(hay_offsets) else len(hay)
+            pos = hay.find(needle, line_end + 1)
+
+        # Context window bounds computed in one vectorized shot. With
+        # context_lines=0 the context would just repeat the matched line,
+        # so the key is omitted entirely.
+        if not match_lines:
+            term_matches = []
+        elif context_lines == 0:
+            term_matches = [
+                {"line_number": i + 1, "matched_line": stripped_lines[i]}
+                for i in match_lines
+            ]
+        else:
+            idxs = np.asarray(match_lines)
+            starts = np.maximum(0, idxs - context_lines)
+            ends = np.minimum(len(lines), idxs + context_lines + 1)
+            term_matches = [
+                {
                     "line_number": i + 1,
-                    "matched_line": line.strip(),
-                    "context": [l.strip() for l in context]
-                })
-
-                if len(term_matches) >= max_matches_per_term:
-                    break
+                    "matched_line": stripped_lines[i],
+                    "context": stripped_lines[s:e]
+                }
+                for i, s, e in zip(match_lines, starts.tolist(), ends.tolist())
+            ]
 
         results["matches"][term] = {
             "count": len(term_matches),
@@ -354,6 +545,10 @@ def search_document(
         for term in search_terms
     }
 
+    _search_result_cache[cache_key] = results
+    while len(_search_result_cache) > _SEARCH_CACHE_MAX:
+        _search_result_cache.popitem(last=False)
+
     return results
 
 
@@ -386,9 +581,10 @@ def extract_document_sections(
     if not section_headers:
         return {"error": "No section headers provided"}
 
+    lines = _get_lines(content)
     results = {
         "document_stats": {
-            "total_lines": len(content.split('\n')),
+            "total_lines": len(lines),
             "total_characters": len(content)
         },
         "sections": {},
@@ -396,43 +592,54 @@ def extract_document_sections(
         "sections_not_found": []
     }
 
-    lines = content.split('\n')
-
+    # Compile both patterns per header once: the full "decorated header line"
+    # form and the simpler "header at start of line" fallback.
+    header_patterns = []
     for header in section_headers:
-        # Try to find the section header (case-insensitive)
         header_pattern = re.compile(
             rf'^[\s\*\#\-]*{re.escape(header)}[\s\*\#\-:]*$',
             re.IGNORECASE | re.MULTILINE
         )
-
-        # Also try simpler pattern: header at start of line
         simple_pattern = re.compile(
             rf'^{re.escape(header)}',
             re.IGNORECASE | re.MULTILINE
         )
+        header_patterns.append((header, header_pattern, simple_pattern))
 
-        section_content = None
-        start_line = None
+    # Locate every requested header in a single pass over the lines,
+    # stopping as soon as all of them have been found. This bounds the scan
+    # at the last header's position instead of one full pass per header.
+    start_lines: Dict[str, int] = {}
+    for i, line in enumerate(lines):
+        stripped = line.strip()
+        for header, header_pattern, simple_pattern in header_patterns:
+            if header in start_lines:
+                continue
+            if header_pattern.match(stripped) or simple_pattern.match(stripped):
+                start_lines[header] = i
+        if len(start_lines) == len(header_patterns):
+            break
 
-        # Find the header line
-        for i, line in enumerate(lines):
-            if header_pattern.match(line.strip()) or simple_pattern.match(line.strip()):
-                start_line = i
-                break
+    for header in section_headers:
+        start_line = start_lines.get(header)
 
         if start_line is not None:
             # Extract content until next section header or end
             section_lines = []
             for j in range(start_line + 1, len(lines)):
                 line = lines[j]
-                # Stop if we hit another section header (line starting with capital letter followed by colon)
-                if re.match(r'^[A-Z][A-Za-z\s]+:', line.strip()):
-                    break
-                # Stop if we hit a markdown header
-                if line.strip().startswith('#'):
+                stripped = line.strip()
+                if not stripped:
+                    section_lines.append(line)
+                    continue
+                # Stop if we hit a markdown header (cheapest check first)
+                if stripped[0] == '#':
                     break
                 # Stop if line looks like a new section (ALL CAPS)
-                if line.strip().isupper() and len(line.strip()) > 3:
+                if stripped.isupper() and len(stripped) > 3:
+                    break
+                # Stop if we hit another section header ("Capitalized Words:")
+                if _SECTION_HDR_RE.match(stripped):
                     break
                 section_lines.append(line)
 
@@ -479,21 +686,23 @@ def store_and_summarize_document(
     if not content:
         return {"error": "No document content provided"}
 
-    # Store the document
+    # Store the document (also warms the per-document line cache)
     store_document(doc_id, content)
 
-    lines = content.split('\n')
+    lines = _get_lines(content)
     words = content.split()
 
-    # Try to identify document type and key sections
-    potential_sections = []
-    for line in lines[:50]:  # Check first 50 lines
-        stripped = line.strip()
-        # Look for section headers (lines ending with colon or all caps)
-        if stripped.endswith(':') and len(stripped) < 50:
-            potential_sections.append(stripped)
-        elif stripped.isupper() and 3 < len(stripped) < 50:
-            potential_sections.append(stripped)
+    # Try to identify document type and key sections (first 50 lines only)
+    cut = 0
+    for _ in range(50):
+        nl = content.find('\n', cut)
+        if nl == -1:
+            cut = len(content)
+            break
+        cut = nl + 1
+    potential_sections = [
+        m.group().strip() for m in _POTENTIAL_SECTION_RE.finditer(content, 0, cut)
+    ]
 
     return {
         "status": "stored",
@@ -525,6 +734,23 @@ TOOL_REGISTRY: Dict[str, callable] = {
     "store_and_summarize_document": store_and_summarize_document,
 }
 
+# Precomputed dispatch table: (callable, parameter names, defaults).
+# Built once at import so execute_tool can assemble a positional args tuple
+# instead of going through **kwargs unpacking on every call.
+_REQUIRED = object()  # sentinel for parameters with no default
+
+_DISPATCH: Dict[str, tuple] = {
+    name: (
+        fn,
+        tuple(inspect.signature(fn).parameters),
+        tuple(
+            p.default if p.default is not inspect.Parameter.empty else _REQUIRED
+            for p in inspect.signature(fn).parameters.values()
+        ),
+    )
+    for name, fn in TOOL_REGISTRY.items()
+}
+
 
 def execute_tool(tool_name: str, tool_input: Dict[str, Any]) -> Any:
     """
@@ -540,11 +766,27 @@ def execute_tool(tool_name: str, tool_input: Dict[str, Any]) -> Any:
     Raises:
         ValueError: If tool not found
     """
-    if tool_name not in TOOL_REGISTRY:
+    entry = _DISPATCH.get(tool_name)
+    if entry is None:
         raise ValueError(f"Unknown tool: {tool_name}. Available: {list(TOOL_REGISTRY.keys())}")
 
-    tool_fn = TOOL_REGISTRY[tool_name]
-    return tool_fn(**tool_input)
+    fn, names, defaults = entry
+    args = []
+    found = 0
+    for param, default in zip(names, defaults):
+        if param in tool_input:
+            args.append(tool_input[param])
+            found += 1
+        elif default is _REQUIRED:
+            raise TypeError(f"{tool_name} missing required argument: '{param}'")
+        else:
+            args.append(default)
+
+    if found != len(tool_input):
+        unexpected = [k for k in tool_input if k not in names]
+        raise TypeError(f"{tool_name} got unexpected argument(s): {unexpected}")
+
+    return fn(*args)
 
 
 def get_available_tools() -> List[str]:
@@ -21,14 +21,17 @@ from medster.tools.analysis.primitives import (
     get_observations,
     get_medications,
     filter_by_text,
+    filter_by_text_batch,
     filter_by_value,
     count_by_field,
     group_by_field,
     aggregate_numeric,
     scan_dicom_directory,
     get_dicom_metadata_from_path,
+    get_dicom_metadata_batch,
     find_patient_images,
     load_dicom_image,
+    load_dicom_images_batch,
     load_ecg_image,
     get_dicom_metadata,
     analyze_image_with_llm,
@@ -89,6 +92,19 @@ def create_sandbox_globals(patient_limit: int, uploaded_content: Optional[str] =
         """Progress logging function available to generated code."""
         logger.info(message)
 
+    # Newline offsets into uploaded_content, built lazily on first search and
+    # reused across calls so repeated searches don't re-split the document.
+    _newline_positions: list = []
+    _newline_positions_built = [False]
+
+    def _get_newline_positions() -> list:
+        if not _newline_positions_built[0]:
+            _newline_positions.extend(
+                i for i, c in enumerate(uploaded_content) if c == '\n'
+            )
+            _newline_positions_built[0] = True
+        return _newline_positions
+
     def search_uploaded_content(pattern: str, case_insensitive: bool = True) -> list:
         """Search uploaded content for lines matching a pattern.
 
@@ -103,11 +119,27 @@ def create_sandbox_globals(patient_limit: int, uploaded_content: Optional[str] =
             return []
 
         import re
-        flags = re.IGNORECASE if case_insensitive else 0
+        from bisect import bisect_right
+
+        # MULTILINE keeps ^/$ anchored per line, as in the old per-line scan
+        flags = re.MULTILINE | (re.IGNORECASE if case_insensitive else 0)
+        compiled = re.compile(pattern, flags)
+        newlines = _get_newline_positions()
+        n = len(uploaded_content)
+
         results = []
-        for i, line in enumerate(uploaded_content.split('\n'), 1):
-            if re.search(pattern, line, flags):
-                results.append({"line_number": i, "content": line.strip()})
+        last_line_idx = -1
+        for m in compiled.finditer(uploaded_content):
+            line_idx = bisect_right(newlines, m.start())
+            if line_idx == last_line_idx:
+                continue  # one result per line, like the old per-line scan
+            last_line_idx = line_idx
+            line_start = newlines[line_idx - 1] + 1 if line_idx > 0 else 0
+            line_end = newlines[line_idx] if line_idx < len(newlines) else n
+            results.append({
+                "line_number": line_idx + 1,
+                "content": uploaded_content[line_start:line_end].strip(),
+            })
         return results
 
     def extract_sections(start_pattern: str, end_pattern: str = None) -> list:
@@ -124,18 +156,24 @@ def create_sandbox_globals(patient_limit: int, uploaded_content: Optional[str] =
             return []
 
         import re
+
+        # Compile once outside the loop - the old per-line re.search paid a
+        # pattern-cache lookup on every line of the document.
+        start_re = re.compile(start_pattern, re.IGNORECASE)
+        end_re = re.compile(end_pattern, re.IGNORECASE) if end_pattern else None
+
         lines = uploaded_content.split('\n')
         sections = []
         current_section = None
         current_lines = []
 
         for line in lines:
-            if re.search(start_pattern, line, re.IGNORECASE):
+            if start_re.search(line):
                 if current_section and current_lines:
                     sections.append({"header": current_section, "content": '\n'.join(current_lines)})
                 current_section = line.strip()
                 current_lines = []
-            elif end_pattern and re.search(end_pattern, line, re.IGNORECASE):
+            elif end_re and end_re.search(line):
                 if current_section:
                     sections.append({"header": current_section, "content": '\n'.join(current_lines)})
                 current_section = None
@@ -162,6 +200,7 @@ def create_sandbox_globals(patient_limit: int, uploaded_content: Optional[str] =
         "get_observations": get_observations,
         "get_medications": get_medications,
         "filter_by_text": filter_by_text,
+        "filter_by_text_batch": filter_by_text_batch,
         "filter_by_value": filter_by_value,
         "count_by_field": count_by_field,
         "group_by_field": group_by_field,
@@ -170,8 +209,10 @@ def create_sandbox_globals(patient_limit: int, uploaded_content: Optional[str] =
         # Vision/Imaging Primitives
         "scan_dicom_directory": scan_dicom_directory,
         "get_dicom_metadata_from_path": get_dicom_metadata_from_path,
+        "get_dicom_metadata_batch": get_dicom_metadata_batch,
         "find_patient_images": find_patient_images,
         "load_dicom_image": load_dicom_image,
+        "load_dicom_images_batch": load_dicom_images_batch,
         "load_ecg_image": load_ecg_image,
         "get_dicom_metadata": get_dicom_metadata,
         "analyze_image_with_llm": analyze_image_with_llm,
@@ -14,11 +14,37 @@ complex clinical reasoning tasks requiring deep medical knowledge and multi-step
 from langchain.tools import tool
 from typing import Literal, Optional
 from pydantic import BaseModel, Field
+import asyncio
+import atexit
+from dataclasses import asdict, dataclass
+import hashlib
 import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
 import requests
 import json
 import sys
 import logging
+import logging.handlers
+
+# orjson decodes ~2-3x faster than stdlib json on the multi-KB analysis
+# blobs the MCP server returns; fall back to stdlib when unavailable.
+try:
+    import orjson
+
+    def _json_loads(data):
+        return orjson.loads(data)
+
+    def _json_dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+except ImportError:
+    def _json_loads(data):
+        return json.loads(data)
+
+    def _json_dumps(obj) -> bytes:
+        return json.dumps(obj).encode("utf-8")
 
 # Configure module logger
 logger = logging.getLogger(__name__)
@@ -38,6 +64,10 @@ MCP_API_KEY = os.getenv("MCP_API_KEY", "")
 # Enable debug logging for MCP calls
 MCP_DEBUG = os.getenv("MCP_DEBUG", "false").lower() == "true"
 
+# Reject oversized notes before burning a 60s network round trip and server
+# tokens on a request that will fail anyway
+MCP_MAX_NOTE_CHARS = int(os.getenv("MCP_MAX_NOTE_CHARS", "200000"))
+
 # Debug log file
 MCP_LOG_FILE = "/Users/sbm4_mac/Desktop/Medster/mcp_debug.log"
 
@@ -50,13 +80,101 @@ Source: https://synthea.mitre.org/downloads - Coherent Data Set]
 
 """
 
-def mcp_log(message: str):
-    """Write debug message to log file"""
-    if MCP_DEBUG:
-        with open(MCP_LOG_FILE, "a") as f:
-            f.write(f"{message}\n")
-        # Also try stderr which might not be captured
-        print(f"{message}", file=sys.stderr)
+# Measured once; the disclaimer is constant so logging call sites don't
+# need to re-run len() on the concatenated payload.
+_DISCLAIMER_LEN = len(SYNTHETIC_DATA_DISCLAIMER)
+
+# Persistent HTTP session: reuses the pooled TCP+TLS connection across tool
+# calls instead of paying a fresh handshake to the CloudFront-fronted MCP
+# endpoint on every request. Transient 429/5xx responses are retried inside
+# urllib3 with exponential backoff, honoring any Retry-After header the
+# server sends; raise_on_status=False hands the final response back to the
+# normal status handling. The Python-level retry loop only handles timeouts.
+_MCP_RETRY = requests.adapters.Retry(
+    total=2,
+    backoff_factor=2,
+    status_forcelist=[429, 500, 502, 503, 504],
+    allowed_methods=["POST"],
+    respect_retry_after_header=True,
+    raise_on_status=False,
+)
+_MCP_SESSION = requests.Session()
+_MCP_SESSION.mount(
+    "https://",
+    requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=_MCP_RETRY),
+)
+atexit.register(_MCP_SESSION.close)
+
+# Even with the pooled session, the first call still pays the full TCP+TLS
+# handshake. Warm the connection in a background thread at import so the
+# agent's first analyze_medical_document call starts on an already-open
+# socket. Failures are ignored; the first real request just connects as
+# it would have anyway. Disable with MCP_PREWARM=false.
+MCP_PREWARM = os.getenv("MCP_PREWARM", "true").lower() == "true"
+
+
+def _prewarm_session():
+    try:
+        base_url = MCP_SERVER_URL.rsplit("/mcp", 1)[0]
+        _MCP_SESSION.get(base_url + "/health", timeout=5)
+    except requests.exceptions.RequestException:
+        pass
+
+
+if MCP_PREWARM and MCP_SERVER_URL.startswith("https://"):
+    threading.Thread(target=_prewarm_session, daemon=True, name="mcp-prewarm").start()
+
+
+# Debug logger with a handler opened once at import, instead of an
+# open/write/close cycle per log line (mcp_log fires ~20 times per tool
+# call). With MCP_DEBUG off the level check short-circuits inside logging.
+_mcp_logger = logging.getLogger(__name__ + ".debug")
+_mcp_logger.propagate = False
+if MCP_DEBUG:
+    _mcp_logger.setLevel(logging.DEBUG)
+    try:
+        _mcp_logger.addHandler(
+            logging.handlers.RotatingFileHandler(MCP_LOG_FILE, maxBytes=10 << 20, backupCount=3)
+        )
+    except OSError:
+        pass  # log directory unavailable; stderr handler below still applies
+    # Also log to stderr, which might not be captured
+    _mcp_logger.addHandler(logging.StreamHandler(sys.stderr))
+else:
+    _mcp_logger.setLevel(logging.WARNING)
+    _mcp_logger.addHandler(logging.NullHandler())
+
+
+# Hoisted request skeleton and headers: these never change between calls,
+# so per-call construction is a shallow copy plus the request ID.
+# CloudFront requires application/json Content-Type for this server.
+_BASE_HEADERS = {
+    "Content-Type": "application/json",
+    "Accept": "application/json, text/event-stream",
+    "Cache-Control": "no-cache, no-store",
+}
+if MCP_API_KEY:
+    _BASE_HEADERS["Authorization"] = f"Bearer {MCP_API_KEY}"
+
+_BASE_MCP_REQUEST = {
+    "jsonrpc": "2.0",
+    "method": "tools/call",
+}
+
+# SSE framing markers as interned bytes constants, so the streaming scan
+# compares against a single shared object instead of rebuilding a literal
+# per line.
+_SSE_DATA_PREFIX = b"data:"
+_SSE_DATA_PREFIX_LEN = len(_SSE_DATA_PREFIX)
+
+
+def mcp_log(message: str, *args):
+    """Write debug message to the MCP debug log.
+
+    Accepts %-style lazy arguments like logging.debug, so call sites pay
+    no string formatting when MCP_DEBUG is off.
+    """
+    _mcp_logger.debug(message, *args)
 
 
 ####################################
@@ -69,6 +187,10 @@ class ComplexNoteAnalysisInput(BaseModel):
         default="complicated",
         description="Level of analysis: 'basic' for simple extraction, 'comprehensive' for detailed analysis, 'complicated' for multi-step clinical reasoning with quality assurance"
     )
+    include_disclaimer: bool = Field(
+        default=True,
+        description="Prepend the synthetic-data disclaimer to the note. Set False if the note already embeds it (e.g. batch analysis) to skip the copy."
+    )
     # NOTE: context parameter removed - not supported by deployed FastMCP server
     # Context can be prepended to note_text if needed
 
@@ -77,53 +199,155 @@ class ComplexNoteAnalysisInput(BaseModel):
 # Tools
 ####################################
 
-@tool(args_schema=ComplexNoteAnalysisInput)
-def analyze_medical_document(
-    note_text: str,
-    analysis_type: Literal["basic", "comprehensive", "complicated"] = "complicated"
-) -> dict:
+
+@dataclass(slots=True, frozen=True)
+class MCPResult:
+    """Internal result record for an MCP analysis call.
+
+    Every internal return path builds one of these instead of an ad-hoc
+    dict, so the result schema lives in one place. slots=True drops the
+    per-instance __dict__, and frozen=True lets cached instances be
+    handed out to multiple callers safely. Converted with asdict() only
+    at the tool boundary, where LangChain requires a plain dict.
     """
-    Analyzes medical documents using the FastMCP server with Claude Sonnet 4.5.
-    Delegates complex clinical analysis to the MCP medical server for AI-powered insights.
 
-    Analysis types:
-    - basic: Quick extraction of key clinical data
-    - comprehensive: Detailed analysis with clinical context (multi-step reasoning)
-    - complicated: Alias for 'comprehensive' (automatically mapped on client side)
+    status: str
+    analysis_type: str
+    server_analysis_type: str = ""
+    analysis: str = ""
+    error: str = ""
+    tokens_used: int = 0
+    processing_time: float = 0.0
+    source: str = ""
+    server_url: str = ""
+    recommendation: str = ""
 
-    Note: 'complicated' is automatically mapped to 'comprehensive' when calling the server,
-    as the deployed FastMCP server uses 'comprehensive' for advanced analysis with Claude Sonnet 4.5.
 
-    Useful for: SOAP notes, discharge summaries, lab interpretations,
-    clinical pattern recognition, and decision support.
+# Completed analyses keyed by (note hash, server analysis type). Clinical
+# workflows repeatedly re-analyze the same note as the agent reasons across
+# turns; a hit skips the 5-30s MCP round trip entirely. Only successful
+# results are cached so transient server errors stay retryable.
+_ANALYSIS_CACHE_MAX = 256
+_analysis_cache: "OrderedDict[tuple, MCPResult]" = OrderedDict()
 
-    Architecture: This tool creates a recursive AI system where:
-    - Local: Claude Sonnet 4.5 (Medster) handles orchestration and tool selection
-    - Remote: Claude Sonnet 4.5 (MCP Server) provides specialist medical analysis
+
+def _analyze_medical_document_impl(
+    note_text: str,
+    analysis_type: Literal["basic", "comprehensive", "complicated"] = "complicated",
+    include_disclaimer: bool = True
+) -> MCPResult:
+    """Synchronous implementation shared by the sync tool and async wrapper."""
+    # Pre-flight validation: skip the network round trip entirely for
+    # requests that can't succeed
+    if not note_text or not note_text.strip():
+        return MCPResult(
+            status="error",
+            analysis_type=analysis_type,
+            error="Note text is empty",
+            recommendation="Provide the clinical note text to analyze",
+        )
+    if len(note_text) > MCP_MAX_NOTE_CHARS:
+        return MCPResult(
+            status="error",
+            analysis_type=analysis_type,
+            error=f"Note exceeds {MCP_MAX_NOTE_CHARS} chars ({len(note_text)})",
+            recommendation="Split the note into sections or use 'basic' analysis",
+        )
+
+    server_type = "comprehensive" if analysis_type == "complicated" else analysis_type
+    cache_key = (
+        hashlib.sha256(note_text.encode("utf-8")).hexdigest(), server_type, include_disclaimer
+    )
+    cached = _analysis_cache.get(cache_key)
+    if cached is not None:
+        _analysis_cache.move_to_end(cache_key)
+        mcp_log("[MCP] Cache hit for analysis_type=%s", server_type)
+        return cached
+
+    result = _analyze_medical_document_uncached(note_text, analysis_type, include_disclaimer)
+
+    if result.status == "success":
+        _analysis_cache[cache_key] = result
+        while len(_analysis_cache) > _ANALYSIS_CACHE_MAX:
+            _analysis_cache.popitem(last=False)
+
+    return result
+
+
+def _format_mcp_result(payload: dict, analysis_type: str, server_analysis_type: str, endpoint: str) -> MCPResult:
+    """Format a parsed MCP tool payload into an MCPResult.
+
+    The payload is the dict carrying "content"/"isError"/"structuredContent",
+    whether it arrived directly or wrapped in a JSON-RPC "result" envelope.
     """
+    content = payload["content"]
+    mcp_log("[MCP] Content type: %s, length: %s", type(content), len(content) if isinstance(content, (list, str)) else "N/A")
+
+    if isinstance(content, list) and len(content) > 0:
+        analysis_text = content[0].get("text", str(content))
+    else:
+        analysis_text = str(content)
+
+    mcp_log("[MCP] Analysis text length: %d chars", len(analysis_text))
+
+    # Check if this is an error response
+    if payload.get("isError"):
+        mcp_log("[MCP] ERROR RESPONSE: %s", analysis_text)
+        return MCPResult(
+            status="error",
+            analysis_type=analysis_type,
+            server_analysis_type=server_analysis_type,
+            error=f"MCP Server Error: {analysis_text}",
+            source=f"MCP Medical Analysis Server ({endpoint})",
+        )
+
+    # Get structured content if available
+    structured = payload.get("structuredContent", {})
+    tokens_used = structured.get("tokens_used", {})
+
+    return MCPResult(
+        status="success",
+        analysis_type=analysis_type,
+        server_analysis_type=server_analysis_type,
+        analysis=analysis_text,
+        tokens_used=tokens_used.get("total_tokens", 0) if isinstance(tokens_used, dict) else 0,
+        processing_time=structured.get("processing_time_seconds", 0),
+        source=f"MCP Medical Analysis Server ({endpoint})",
+    )
+
+
+def _analyze_medical_document_uncached(
+    note_text: str,
+    analysis_type: Literal["basic", "comprehensive", "complicated"] = "complicated",
+    include_disclaimer: bool = True
+) -> MCPResult:
+    """Perform the actual MCP server round trip (no caching)."""
     try:
-        mcp_log(f"[MCP] Calling server at {MCP_SERVER_URL}")
-        mcp_log(f"[MCP] Analysis type: {analysis_type}")
-        mcp_log(f"[MCP] Note text length: {len(note_text)} chars")
+        mcp_log("[MCP] Calling server at %s", MCP_SERVER_URL)
+        mcp_log("[MCP] Analysis type: %s", analysis_type)
+        mcp_log("[MCP] Note text length: %d chars", len(note_text))
 
         # Map Medster analysis types to server analysis types
         # Server uses "comprehensive" for advanced analysis (not "complicated")
         server_analysis_type = analysis_type
         if analysis_type == "complicated":
             server_analysis_type = "comprehensive"
-            mcp_log(f"[MCP] Mapping 'complicated' -> 'comprehensive' for server")
+            mcp_log("[MCP] Mapping 'complicated' -> 'comprehensive' for server")
 
         # Prepend synthetic data disclaimer to avoid Claude safeguard issues
-        # The Coherent Data Set is synthetic - no PHI concerns
-        note_with_disclaimer = SYNTHETIC_DATA_DISCLAIMER + note_text
-        mcp_log(f"[MCP] Added synthetic data disclaimer ({len(SYNTHETIC_DATA_DISCLAIMER)} chars)")
-
-        # Build MCP JSON-RPC 2.0 request for tool call
-        # The /mcp endpoint requires JSON-RPC format
+        # The Coherent Data Set is synthetic - no PHI concerns. Callers that
+        # already embedded it can opt out and skip the payload copy.
+        if include_disclaimer:
+            note_with_disclaimer = SYNTHETIC_DATA_DISCLAIMER + note_text
+            mcp_log("[MCP] Added synthetic data disclaimer (%d chars)", _DISCLAIMER_LEN)
+        else:
+            note_with_disclaimer = note_text
+
+        # Build MCP JSON-RPC 2.0 request for tool call from the hoisted
+        # skeleton - the /mcp endpoint requires JSON-RPC format
         mcp_request = {
-            "jsonrpc": "2.0",
+            **_BASE_MCP_REQUEST,
             "id": 1,
-            "method": "tools/call",
             "params": {
                 "name": "analyze_medical_document",
                 "arguments": {
@@ -138,275 +362,346 @@ def analyze_medical_document(
         # if context:
         #     mcp_request["params"]["arguments"]["context"] = context
 
-        # Try MCP JSON-RPC endpoint - use URL directly as provided
-        mcp_endpoints = [
-            MCP_SERVER_URL,  # Use the complete endpoint URL from config
-        ]
-
-        import time as time_module
-        import uuid
+        # Single MCP JSON-RPC endpoint - use URL directly as provided
+        endpoint = MCP_SERVER_URL
 
         # Add unique request ID to prevent CloudFront caching
-        request_id = str(uuid.uuid4())
+        request_id = secrets.token_hex(8)
         mcp_request["id"] = request_id
-        mcp_log(f"[MCP] Request ID: {request_id}")
+        mcp_log("[MCP] Request ID: %s", request_id)
 
         # Note: Warmup ping removed - HEAD method returns 405 on MCP endpoints
         # The unique request ID prevents caching issues instead
 
         last_error = None
-        for endpoint in mcp_endpoints:
-            # Retry logic with exponential backoff for timeouts
-            max_retries = 2
-            for retry in range(max_retries):
-                try:
-                    mcp_log(f"[MCP] Trying endpoint: {endpoint} (attempt {retry + 1}/{max_retries})")
-                    if endpoint.endswith("/mcp") or endpoint.endswith("/rpc"):
-                        mcp_log(f"[MCP] Request arguments: {mcp_request['params']['arguments']}")
-
-                    # Build headers with optional auth
-                    # CloudFront requires application/json Content-Type for this server
-                    headers = {
-                        "Content-Type": "application/json",
-                        "Accept": "application/json, text/event-stream",
-                        "Cache-Control": "no-cache, no-store",
-                        "X-Request-ID": request_id,
-                    }
-                    if MCP_API_KEY:
-                        headers["Authorization"] = f"Bearer {MCP_API_KEY}"
-
-                    # Send JSON-RPC request (NOT plain text - CloudFront rejects text/plain)
-                    mcp_log(f"[MCP] Sending JSON-RPC request to {endpoint}")
-
-                    response = requests.post(
-                        endpoint,
-                        json=mcp_request,  # JSON-RPC format
-                        headers=headers,
-                        timeout=60  # 1 minute timeout (reduced from 3 min for better UX)
-                    )
-                    mcp_log(f"[MCP] Response status: {response.status_code}")
-                    mcp_log(f"[MCP] Response headers: {dict(response.headers)}")
-                    mcp_log(f"[MCP] Response body (first 500 chars): {response.text[:500]}")
-
-                    if response.status_code == 200:
-                        # Handle SSE (Server-Sent Events) format from FastMCP
-                        response_text = response.text
-                        mcp_log(f"[MCP] Parsing response format")
-
-                        # Parse SSE format: SSE can have ping comments (: ping), event lines, and data lines
-                        # Look for "data:" line which contains the JSON-RPC response
-                        if "event:" in response_text or response_text.startswith(":"):
-                            # Extract JSON from SSE data line
-                            lines = response_text.split("\n")
-                            mcp_log(f"[MCP] Found {len(lines)} lines in SSE response")
-                            for line in lines:
-                                if line.startswith("data:"):
-                                    json_str = line[5:].strip()  # Remove "data:" prefix
-                                    mcp_log(f"[MCP] Found data line, length: {len(json_str)} chars")
-                                    try:
-                                        result = json.loads(json_str)
-                                        mcp_log(f"[MCP] Successfully parsed JSON-RPC response")
-                                    except json.JSONDecodeError as e:
-                                        logger.error(f"JSON parsing error in SSE data: {e}")
-                                        mcp_log(f"[MCP] JSON parsing error: {e}")
-                                        mcp_log(f"[MCP] Malformed JSON (first 200 chars): {json_str[:200]}")
-                                        result = {"error": f"JSON parsing error: {str(e)}", "raw_data": json_str[:500]}
-                                    break
-                            else:
-                                logger.warning("No data line found in SSE response")
-                                mcp_log(f"[MCP] No data line in SSE response")
-                                result = {"error": "No data in SSE response"}
-                        else:
-                            # Regular JSON response
-                            mcp_log(f"[MCP] Parsing as regular JSON")
+        # Retry logic with exponential backoff for timeouts
+        max_retries = 2
+        for retry in range(max_retries):
+            try:
+                mcp_log("[MCP] Trying endpoint: %s (attempt %d/%d)", endpoint, retry + 1, max_retries)
+                if endpoint.endswith("/mcp") or endpoint.endswith("/rpc"):
+                    mcp_log("[MCP] Request arguments: %s", mcp_request['params']['arguments'])
+
+                # Copy the hoisted headers (auth already resolved at
+                # import); only the request ID varies per call
+                headers = _BASE_HEADERS.copy()
+                headers["X-Request-ID"] = request_id
+
+                # Send JSON-RPC request (NOT plain text - CloudFront rejects text/plain)
+                mcp_log("[MCP] Sending JSON-RPC request to %s", endpoint)
+
+                response = _MCP_SESSION.post(
+                    endpoint,
+                    data=_json_dumps(mcp_request),  # JSON-RPC format (Content-Type set above)
+                    headers=headers,
+                    timeout=(5, 60),  # 5s connect, 60s read (reduced from 3 min for better UX)
+                    stream=True  # parse SSE incrementally, don't buffer the whole body
+                )
+                mcp_log("[MCP] Response status: %s", response.status_code)
+                mcp_log("[MCP] Response headers: %s", dict(response.headers))
+
+                if response.status_code == 200:
+                    # Handle SSE (Server-Sent Events) format from FastMCP
+                    content_type = response.headers.get("Content-Type", "")
+                    mcp_log("[MCP] Parsing response format (%s)", content_type)
+
+                    # Parse SSE incrementally: skip ping comments (: ping)
+                    # and event lines, decode the first "data:" line as
+                    # the JSON-RPC response. No response.text
+                    # materialization, no per-line list allocation.
+                    if "text/event-stream" in content_type:
+                        result = None
+                        # Iterate raw bytes lines: ping comments and
+                        # event markers are skipped on a prefix compare
+                        # without ever being decoded, and the JSON
+                        # decoder takes the data payload as bytes.
+                        for line in response.iter_lines(chunk_size=8192):
+                            if not line or not line.startswith(_SSE_DATA_PREFIX):
+                                continue
+                            json_bytes = line[_SSE_DATA_PREFIX_LEN:].strip()  # Remove "data:" prefix
+                            mcp_log("[MCP] Found data line, length: %d bytes", len(json_bytes))
                             try:
-                                result = response.json()
-                            except json.JSONDecodeError as e:
-                                logger.error(f"JSON parsing error in response: {e}")
-                                mcp_log(f"[MCP] JSON parsing error: {e}")
-                                mcp_log(f"[MCP] Malformed response (first 200 chars): {response_text[:200]}")
-                                result = {"error": f"JSON parsing error: {str(e)}", "raw_data": response_text[:500]}
-
-                        mcp_log(f"[MCP] Success from {endpoint}")
-                        mcp_log(f"[MCP] Response keys: {result.keys() if isinstance(result, dict) else 'not dict'}")
-
-                        # Handle direct MCP response format (not JSON-RPC wrapped)
-                        # Response format: {"content": [...], "isError": false, "structuredContent": {...}}
-                        if "content" in result:
-                            content = result["content"]
-                            mcp_log(f"[MCP] Content type: {type(content)}, length: {len(content) if isinstance(content, (list, str)) else 'N/A'}")
-
-                            if isinstance(content, list) and len(content) > 0:
-                                analysis_text = content[0].get("text", str(content))
-                            else:
-                                analysis_text = str(content)
-
-                            mcp_log(f"[MCP] Analysis text length: {len(analysis_text)} chars")
-
-                            # Check if this is an error response
-                            if result.get("isError"):
-                                mcp_log(f"[MCP] ERROR RESPONSE: {analysis_text}")
-                                return {
-                                    "analysis_type": analysis_type,
-                                    "server_analysis_type": server_analysis_type,
-                                    "status": "error",
-                                    "error": f"MCP Server Error: {analysis_text}",
-                                    "source": f"MCP Medical Analysis Server ({endpoint})"
-                                }
-
-                            # Get structured content if available
-                            structured = result.get("structuredContent", {})
-                            tokens_used = structured.get("tokens_used", {})
-
-                            return {
-                                "analysis_type": analysis_type,
-                                "server_analysis_type": server_analysis_type,
-                                "status": "success",
-                                "analysis": analysis_text,
-                                "tokens_used": tokens_used.get("total_tokens", 0) if isinstance(tokens_used, dict) else 0,
-                                "processing_time": structured.get("processing_time_seconds", 0),
-                                "source": f"MCP Medical Analysis Server ({endpoint})"
-                            }
-                        elif "result" in result:
-                            # JSON-RPC wrapped response
-                            mcp_result = result["result"]
-                            mcp_log(f"[MCP] JSON-RPC result keys: {mcp_result.keys() if isinstance(mcp_result, dict) else type(mcp_result)}")
-
-                            if isinstance(mcp_result, dict) and "content" in mcp_result:
-                                content = mcp_result["content"]
-                                mcp_log(f"[MCP] Content type: {type(content)}, length: {len(content) if isinstance(content, (list, str)) else 'N/A'}")
-
-                                if isinstance(content, list) and len(content) > 0:
-                                    analysis_text = content[0].get("text", str(content))
-                                else:
-                                    analysis_text = str(content)
-
-                                mcp_log(f"[MCP] Analysis text length: {len(analysis_text)} chars")
-
-                                # Check for error
-                                if mcp_result.get("isError"):
-                                    mcp_log(f"[MCP] ERROR RESPONSE: {analysis_text}")
-                                    return {
-                                        "analysis_type": analysis_type,
-                                        "server_analysis_type": server_analysis_type,
-                                        "status": "error",
-                                        "error": f"MCP Server Error: {analysis_text}",
-                                        "source": f"MCP Medical Analysis Server ({endpoint})"
-                                    }
-
-                                # Get structured content if available
-                                structured = mcp_result.get("structuredContent", {})
-                                tokens_used = structured.get("tokens_used", {})
-
-                                return {
-                                    "analysis_type": analysis_type,
-                                    "server_analysis_type": server_analysis_type,
-                                    "status": "success",
-                                    "analysis": analysis_text,
-                                    "tokens_used": tokens_used.get("total_tokens", 0) if isinstance(tokens_used, dict) else 0,
-                                    "processing_time": structured.get("processing_time_seconds", 0),
-                                    "source": f"MCP Medical Analysis Server ({endpoint})"
+                                result = _json_loads(json_bytes)
+                                mcp_log("[MCP] Successfully parsed JSON-RPC response")
+                            except ValueError as e:  # covers orjson and stdlib JSONDecodeError
+                                logger.error(f"JSON parsing error in SSE data: {e}")
+                                mcp_log("[MCP] JSON parsing error: %s", e)
+                                mcp_log("[MCP] Malformed JSON (first 200 bytes): %r", json_bytes[:200])
+                                result = {
+                                    "error": f"JSON parsing error: {str(e)}",
+                                    "raw_data": json_bytes[:500].decode("utf-8", errors="replace")
                                 }
-                        elif "error" in result:
-                            last_error = result["error"].get("message", str(result["error"])) if isinstance(result["error"], dict) else str(result["error"])
                             break
-                        else:
-                            # Unknown format - return as-is
-                            return {
-                                "analysis_type": analysis_type,
-                                "server_analysis_type": server_analysis_type,
-                                "status": "success",
-                                "analysis": str(result),
-                                "source": f"MCP Medical Analysis Server ({endpoint})"
-                            }
-                    elif response.status_code == 404:
-                        last_error = f"Endpoint not found: {endpoint}"
-                        logger.error(f"MCP endpoint not found (404): {endpoint}")
-                        mcp_log(f"[MCP] 404 response body: {response.text[:500]}")
-                        break  # Try next endpoint
-                    elif response.status_code == 401 or response.status_code == 403:
-                        last_error = f"Authentication/Authorization error ({response.status_code}): {endpoint}"
-                        logger.error(f"MCP auth error ({response.status_code}): {endpoint}")
-                        mcp_log(f"[MCP] Auth error response: {response.text[:500]}")
-                        break  # Try next endpoint
-                    elif response.status_code >= 500:
-                        last_error = f"Server error ({response.status_code}): {endpoint}"
-                        logger.error(f"MCP server error ({response.status_code}): {endpoint}")
-                        mcp_log(f"[MCP] Server error response: {response.text[:500]}")
-                        break  # Try next endpoint
+                        response.close()
+                        if result is None:
+                            logger.warning("No data line found in SSE response")
+                            mcp_log("[MCP] No data line in SSE response")
+                            result = {"error": "No data in SSE response"}
                     else:
-                        last_error = f"HTTP error {response.status_code}: {response.text[:200]}"
-                        logger.error(f"MCP HTTP error ({response.status_code}): {endpoint}")
-                        mcp_log(f"[MCP] Error response: Status {response.status_code}")
-                        mcp_log(f"[MCP] Response body: {response.text[:500]}")
-                        break  # Try next endpoint
-
-                except requests.exceptions.Timeout:
-                    last_error = f"Timeout after 60s (attempt {retry + 1})"
-                    logger.warning(f"MCP request timeout: attempt {retry + 1}/{max_retries}")
-                    mcp_log(f"[MCP] Timeout on attempt {retry + 1}/{max_retries}")
-                    if retry < max_retries - 1:
-                        wait_time = 5 * (retry + 1)  # 5s, 10s backoff
-                        mcp_log(f"[MCP] Waiting {wait_time}s before retry...")
-                        time_module.sleep(wait_time)
-                        continue
-                    break  # All retries exhausted, try next endpoint
-                except requests.exceptions.SSLError as e:
-                    last_error = f"SSL/TLS error connecting to {endpoint}"
-                    logger.error(f"MCP SSL error: {e}")
-                    mcp_log(f"[MCP] SSL error: {e}")
-                    break  # SSL errors are not retryable, try next endpoint
-                except requests.exceptions.ConnectionError as e:
-                    last_error = f"Connection failed to {endpoint}"
-                    logger.error(f"MCP connection error: {e}")
-                    mcp_log(f"[MCP] Connection error: {e}")
-                    break  # Try next endpoint
-                except json.JSONDecodeError as e:
-                    last_error = f"Malformed JSON response from {endpoint}"
-                    logger.error(f"MCP JSON decode error: {e}")
-                    mcp_log(f"[MCP] JSON decode error in outer handler: {e}")
-                    break  # Try next endpoint
-                except Exception as e:
-                    last_error = str(e)
-                    logger.error(f"MCP unexpected error: {type(e).__name__}: {e}")
-                    mcp_log(f"[MCP] Exception ({type(e).__name__}): {e}")
-                    break  # Try next endpoint
-
-        # All endpoints failed
-        logger.error(f"All MCP endpoints failed. Last error: {last_error}")
-        mcp_log(f"[MCP] All endpoints failed. Last error: {last_error}")
-        return {
-            "analysis_type": analysis_type,
-            "status": "error",
-            "error": f"All MCP endpoints failed. Last error: {last_error}",
-            "server_url": MCP_SERVER_URL,
-            "recommendation": "Check MCP server status and endpoint configuration"
-        }
+                        # Regular JSON response
+                        mcp_log("[MCP] Parsing as regular JSON")
+                        try:
+                            result = _json_loads(response.content)
+                        except ValueError as e:  # covers orjson and stdlib JSONDecodeError
+                            logger.error(f"JSON parsing error in response: {e}")
+                            mcp_log("[MCP] JSON parsing error: %s", e)
+                            mcp_log("[MCP] Malformed response (first 200 chars): %s", response.text[:200])
+                            result = {"error": f"JSON parsing error: {str(e)}", "raw_data": response.text[:500]}
+
+                    mcp_log("[MCP] Success from %s", endpoint)
+                    mcp_log("[MCP] Response keys: %s", result.keys() if isinstance(result, dict) else 'not dict')
+
+                    # The tool payload ("content"/"isError"/"structuredContent")
+                    # arrives either directly or wrapped in a JSON-RPC
+                    # "result" envelope; unwrap once and format both the
+                    # same way.
+                    payload = result.get("result") if isinstance(result.get("result"), dict) else result
+                    if isinstance(payload, dict) and "content" in payload:
+                        return _format_mcp_result(payload, analysis_type, server_analysis_type, endpoint)
+                    elif "error" in result:
+                        last_error = result["error"].get("message", str(result["error"])) if isinstance(result["error"], dict) else str(result["error"])
+                        break
+                    else:
+                        # Unknown format - return as-is
+                        return MCPResult(
+                            status="success",
+                            analysis_type=analysis_type,
+                            server_analysis_type=server_analysis_type,
+                            analysis=str(result),
+                            source=f"MCP Medical Analysis Server ({endpoint})",
+                        )
+                elif response.status_code == 404:
+                    last_error = f"Endpoint not found: {endpoint}"
+                    logger.error(f"MCP endpoint not found (404): {endpoint}")
+                    mcp_log("[MCP] 404 response body: %s", response.text[:500])
+                    break
+                elif response.status_code == 401 or response.status_code == 403:
+                    last_error = f"Authentication/Authorization error ({response.status_code}): {endpoint}"
+                    logger.error(f"MCP auth error ({response.status_code}): {endpoint}")
+                    mcp_log("[MCP] Auth error response: %s", response.text[:500])
+                    break
+                elif response.status_code >= 500:
+                    last_error = f"Server error ({response.status_code}): {endpoint}"
+                    logger.error(f"MCP server error ({response.status_code}): {endpoint}")
+                    mcp_log("[MCP] Server error response: %s", response.text[:500])
+                    break
+                else:
+                    last_error = f"HTTP error {response.status_code}: {response.text[:200]}"
+                    logger.error(f"MCP HTTP error ({response.status_code}): {endpoint}")
+                    mcp_log("[MCP] Error response: Status %s", response.status_code)
+                    mcp_log("[MCP] Response body: %s", response.text[:500])
+                    break
+
+            except requests.exceptions.Timeout:
+                last_error = f"Timeout after 60s (attempt {retry + 1})"
+                logger.warning(f"MCP request timeout: attempt {retry + 1}/{max_retries}")
+                mcp_log("[MCP] Timeout on attempt %d/%d", retry + 1, max_retries)
+                if retry < max_retries - 1:
+                    wait_time = 5 * (retry + 1)  # 5s, 10s backoff
+                    mcp_log("[MCP] Waiting %ds before retry...", wait_time)
+                    time.sleep(wait_time)
+                    continue
+                break  # All retries exhausted
+            except requests.exceptions.SSLError as e:
+                last_error = f"SSL/TLS error connecting to {endpoint}"
+                logger.error(f"MCP SSL error: {e}")
+                mcp_log("[MCP] SSL error: %s", e)
+                break  # SSL errors are not retryable
+            except requests.exceptions.ConnectionError as e:
+                last_error = f"Connection failed to {endpoint}"
+                logger.error(f"MCP connection error: {e}")
+                mcp_log("[MCP] Connection error: %s", e)
+                break
+            except json.JSONDecodeError as e:
+                last_error = f"Malformed JSON response from {endpoint}"
+                logger.error(f"MCP JSON decode error: {e}")
+                mcp_log("[MCP] JSON decode error in outer handler: %s", e)
+                break
+            except Exception as e:
+                last_error = str(e)
+                logger.error(f"MCP unexpected error: {type(e).__name__}: {e}")
+                mcp_log("[MCP] Exception (%s): %s", type(e).__name__, e)
+                break
+
+        # Request failed after retries
+        logger.error(f"MCP request failed. Last error: {last_error}")
+        mcp_log("[MCP] Request failed. Last error: %s", last_error)
+        return MCPResult(
+            status="error",
+            analysis_type=analysis_type,
+            error=f"MCP request failed. Last error: {last_error}",
+            server_url=MCP_SERVER_URL,
+            recommendation="Check MCP server status and endpoint configuration",
+        )
 
     except requests.exceptions.Timeout:
         logger.error("MCP server request timed out at outer level")
-        mcp_log(f"[MCP] Outer timeout exception")
-        return {
-            "analysis_type": analysis_type,
-            "status": "error",
-            "error": "MCP server request timed out",
-            "recommendation": "Try 'comprehensive' or 'basic' analysis type for faster results"
-        }
+        mcp_log("[MCP] Outer timeout exception")
+        return MCPResult(
+            status="error",
+            analysis_type=analysis_type,
+            error="MCP server request timed out",
+            recommendation="Try 'comprehensive' or 'basic' analysis type for faster results",
+        )
     except json.JSONDecodeError as e:
         logger.error(f"MCP JSON decode error at outer level: {e}")
-        mcp_log(f"[MCP] Outer JSON decode error: {e}")
-        return {
-            "analysis_type": analysis_type,
-            "status": "error",
-            "error": f"Failed to parse MCP server response: {str(e)}",
-            "recommendation": "Server returned malformed JSON response"
-        }
+        mcp_log("[MCP] Outer JSON decode error: %s", e)
+        return MCPResult(
+            status="error",
+            analysis_type=analysis_type,
+            error=f"Failed to parse MCP server response: {str(e)}",
+            recommendation="Server returned malformed JSON response",
+        )
     except Exception as e:
         logger.error(f"MCP unexpected error at outer level: {type(e).__name__}: {e}")
-        mcp_log(f"[MCP] Outer exception ({type(e).__name__}): {e}")
-        return {
-            "analysis_type": analysis_type,
-            "status": "error",
-            "error": f"{type(e).__name__}: {str(e)}",
-            "recommendation": "Check logs for detailed error information"
-        }
+        mcp_log("[MCP] Outer exception (%s): %s", type(e).__name__, e)
+        return MCPResult(
+            status="error",
+            analysis_type=analysis_type,
+            error=f"{type(e).__name__}: {str(e)}",
+            recommendation="Check logs for detailed error information",
+        )
+
+
+@tool(args_schema=ComplexNoteAnalysisInput)
+def analyze_medical_document(
+    note_text: str,
+    analysis_type: Literal["basic", "comprehensive", "complicated"] = "complicated",
+    include_disclaimer: bool = True
+) -> dict:
+    """
+    Analyzes medical documents using the FastMCP server with Claude Sonnet 4.5.
+    Delegates complex clinical analysis to the MCP medical server for AI-powered insights.
+
+    Analysis types:
+    - basic: Quick extraction of key clinical data
+    - comprehensive: Detailed analysis with clinical context (multi-step reasoning)
+    - complicated: Alias for 'comprehensive' (automatically mapped on client side)
+
+    Note: 'complicated' is automatically mapped to 'comprehensive' when calling the server,
+    as the deployed FastMCP server uses 'comprehensive' for advanced analysis with Claude Sonnet 4.5.
+
+    Useful for: SOAP notes, discharge summaries, lab interpretations,
+    clinical pattern recognition, and decision support.
+
+    Architecture: This tool creates a recursive AI system where:
+    - Local: Claude Sonnet 4.5 (Medster) handles orchestration and tool selection
+    - Remote: Claude Sonnet 4.5 (MCP Server) provides specialist medical analysis
+    """
+    return asdict(_analyze_medical_document_impl(note_text, analysis_type, include_disclaimer))
+
+
+async def analyze_medical_document_async(
+    note_text: str,
+    analysis_type: Literal["basic", "comprehensive", "complicated"] = "complicated",
+    include_disclaimer: bool = True
+) -> dict:
+    """
+    Async variant of analyze_medical_document for event-loop callers.
+
+    Runs the blocking MCP request in a worker thread so multiple document
+    analyses can be awaited concurrently (their network waits overlap)
+    without stalling the event loop for up to the 60s request timeout.
+    """
+    result = await asyncio.to_thread(
+        _analyze_medical_document_impl, note_text, analysis_type, include_disclaimer
+    )
+    return asdict(result)
+
+def analyze_medical_documents_batch(
+    notes: list,
+    analysis_type: Literal["basic", "comprehensive", "complicated"] = "complicated",
+    include_disclaimer: bool = True
+) -> list:
+    """
+    Analyze several notes with one JSON-RPC 2.0 batch request.
+
+    JSON-RPC supports array-framed batches, so N notes cost one HTTP round
+    trip (TLS handshake, CloudFront dispatch) instead of N. Responses are
+    matched back to their notes by request id, so results are returned in
+    input order. If the server rejects the batch framing, each note falls
+    back to an individual analyze_medical_document call (which also
+    benefits from the analysis cache).
+    """
+    if not notes:
+        return []
+
+    server_analysis_type = "comprehensive" if analysis_type == "complicated" else analysis_type
+
+    batch = []
+    for i, note in enumerate(notes):
+        document = SYNTHETIC_DATA_DISCLAIMER + note if include_disclaimer else note
+        batch.append({
+            **_BASE_MCP_REQUEST,
+            "id": i,
+            "params": {
+                "name": "analyze_medical_document",
+                "arguments": {
+                    "document_content": document,
+                    "analysis_type": server_analysis_type,
+                }
+            }
+        })
+
+    headers = _BASE_HEADERS.copy()
+    headers["X-Request-ID"] = secrets.token_hex(8)
+
+    mcp_log("[MCP] Batch request: %d notes", len(batch))
+    try:
+        response = _MCP_SESSION.post(
+            MCP_SERVER_URL,
+            data=_json_dumps(batch),
+            headers=headers,
+            timeout=(5, 120)  # batches take longer server-side
+        )
+        response.raise_for_status()
+        parsed = _json_loads(response.content)
+    except (requests.exceptions.RequestException, ValueError) as e:
+        mcp_log("[MCP] Batch request failed (%s: %s); falling back to per-note calls", type(e).__name__, e)
+        return [
+            asdict(_analyze_medical_document_impl(note, analysis_type, include_disclaimer))
+            for note in notes
+        ]
+
+    if not isinstance(parsed, list):
+        # Server doesn't support batch framing - run notes individually
+        mcp_log("[MCP] Server returned a single object for a batch; falling back to per-note calls")
+        return [
+            asdict(_analyze_medical_document_impl(note, analysis_type, include_disclaimer))
+            for note in notes
+        ]
+
+    by_id = {entry.get("id"): entry for entry in parsed if isinstance(entry, dict)}
+    results = []
+    for i in range(len(notes)):
+        entry = by_id.get(i)
+        if entry is None:
+            results.append(MCPResult(
+                status="error",
+                analysis_type=analysis_type,
+                error=f"No response for batch entry {i}",
+            ))
+            continue
+        payload = entry.get("result") if isinstance(entry.get("result"), dict) else entry
+        if isinstance(payload, dict) and "content" in payload:
+            results.append(
+                _format_mcp_result(payload, analysis_type, server_analysis_type, MCP_SERVER_URL)
+            )
+        elif "error" in entry:
+            error = entry["error"]
+            message = error.get("message", str(error)) if isinstance(error, dict) else str(error)
+            results.append(MCPResult(
+                status="error",
+                analysis_type=analysis_type,
+                server_analysis_type=server_analysis_type,
+                error=f"MCP Server Error: {message}",
+            ))
+        else:
+            results.append(MCPResult(
+                status="success",
+                analysis_type=analysis_type,
+                server_analysis_type=server_analysis_type,
+                analysis=str(entry),
+                source=f"MCP Medical Analysis Server ({MCP_SERVER_URL})",
+            ))
+    return [asdict(r) for r in results]
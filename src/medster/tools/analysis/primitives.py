@@ -1,15 +1,23 @@
 # Primitive functions for LLM-generated code
 # These are the building blocks the agent can compose into custom analysis
 
+import hashlib
+import operator as _op
 import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from collections import Counter, OrderedDict, defaultdict
 from typing import List, Dict, Any, Optional
 from pathlib import Path
 from medster.tools.medical.api import (
     load_patient_bundle,
     list_available_patients,
-    extract_conditions,
-    extract_observations,
-    extract_medications
+    extract_conditions_from_resources,
+    extract_observations_from_resources,
+    extract_medications_from_resources
 )
 from medster.config import (
     COHERENT_DICOM_PATH_ABS,
@@ -23,11 +31,13 @@ from medster.utils.gcs_storage import (
     get_dicom_metadata_from_gcs,
     convert_dicom_to_png_from_gcs,
     load_csv_file as gcs_load_csv_file,
+    stream_csv_file as gcs_stream_csv_file,
     list_dna_files as gcs_list_dna_files,
     load_dna_file as gcs_load_dna_file,
 )
 # Local file utilities (used when USE_GCS=false)
 from medster.utils.image_utils import (
+    CLAUDE_MAX_EDGE,
     dicom_to_base64_png,
     load_ecg_image_from_csv,
     find_patient_dicom_files,
@@ -48,28 +58,52 @@ def get_patients(limit: Optional[int] = None) -> List[str]:
     return list_available_patients(limit=limit)
 
 
+# Bundles are walked once into a resourceType index so that the common
+# get_conditions/get_observations/get_medications triple per patient costs
+# one pass over the entries instead of three. Cached by object identity;
+# the bundle itself is kept in the entry so the id() can't be recycled
+# while the index is alive.
+_BUNDLE_INDEX_CACHE_MAX = 8
+_bundle_index_cache: "OrderedDict[int, tuple]" = OrderedDict()
+
+
+def _index_bundle(bundle: Dict) -> Dict[str, List[Dict]]:
+    """Group a bundle's resources by resourceType in one pass."""
+    index = defaultdict(list)
+    for entry in bundle.get("entry", []):
+        resource = entry.get("resource", {})
+        index[resource.get("resourceType")].append(resource)
+    return index
+
+
 def search_resources(bundle: Dict, resource_type: str) -> List[Dict]:
     """Extract all resources of a given type from a FHIR bundle."""
     if not bundle:
         return []
 
-    resources = []
-    for entry in bundle.get("entry", []):
-        resource = entry.get("resource", {})
-        if resource.get("resourceType") == resource_type:
-            resources.append(resource)
-    return resources
+    key = id(bundle)
+    cached = _bundle_index_cache.get(key)
+    if cached is not None and cached[0] is bundle:
+        _bundle_index_cache.move_to_end(key)
+        index = cached[1]
+    else:
+        index = _index_bundle(bundle)
+        _bundle_index_cache[key] = (bundle, index)
+        while len(_bundle_index_cache) > _BUNDLE_INDEX_CACHE_MAX:
+            _bundle_index_cache.popitem(last=False)
+
+    # Copy so callers can mutate their result without corrupting the index
+    return list(index.get(resource_type, ()))
 
 
 def get_conditions(bundle: Dict) -> List[Dict]:
     """Extract condition/diagnosis data from a FHIR bundle."""
-    return extract_conditions({"entry": [{"resource": r} for r in search_resources(bundle, "Condition")]})
+    return extract_conditions_from_resources(search_resources(bundle, "Condition"))
 
 
 def get_observations(bundle: Dict, category: Optional[str] = None) -> List[Dict]:
     """Extract observations (labs, vitals) from a FHIR bundle."""
-    obs_bundle = {"entry": [{"resource": r} for r in search_resources(bundle, "Observation")]}
-    observations = extract_observations(obs_bundle)
+    observations = extract_observations_from_resources(search_resources(bundle, "Observation"))
 
     if category:
         # Filter by FHIR category field (e.g., 'laboratory', 'vital-signs')
@@ -85,92 +119,335 @@ def get_observations(bundle: Dict, category: Optional[str] = None) -> List[Dict]
 
 def get_medications(bundle: Dict) -> List[Dict]:
     """Extract medication data from a FHIR bundle."""
-    return extract_medications({"entry": [{"resource": r} for r in search_resources(bundle, "MedicationRequest")]})
+    return extract_medications_from_resources(search_resources(bundle, "MedicationRequest"))
 
 
 def filter_by_text(items: List[Dict], field: str, search_text: str, case_sensitive: bool = False) -> List[Dict]:
     """Filter items where field contains search text."""
-    results = []
-    search = search_text if case_sensitive else search_text.lower()
+    if case_sensitive:
+        search = search_text
+        return [item for item in items if search in str(item.get(field, ""))]
 
-    for item in items:
-        value = str(item.get(field, ""))
-        if not case_sensitive:
-            value = value.lower()
-        if search in value:
-            results.append(item)
-    return results
+    search = search_text.lower()
+    return [item for item in items if search in str(item.get(field, "")).lower()]
+
+
+def filter_by_text_batch(items: List[Dict], field: str, search_texts: List[str],
+                         case_sensitive: bool = False) -> Dict[str, List[Dict]]:
+    """
+    Run several text filters over the same items in one pass.
+
+    The field values are projected (and lowercased) once and every search
+    term scans that projection, instead of re-stringifying the items per
+    term the way repeated filter_by_text calls would.
+
+    Args:
+        items: Items to filter
+        field: Field to search in
+        search_texts: Search terms, one result list per term
+        case_sensitive: Whether to match case
+
+    Returns:
+        Dict mapping each search term to its matching items
+    """
+    if case_sensitive:
+        pairs = [(str(item.get(field, "")), item) for item in items]
+        terms = list(search_texts)
+    else:
+        pairs = [(str(item.get(field, "")).lower(), item) for item in items]
+        terms = [text.lower() for text in search_texts]
+
+    return {
+        original: [item for value, item in pairs if term in value]
+        for original, term in zip(search_texts, terms)
+    }
+
+
+# Comparison operators for filter_by_value, mapped once to NumPy ufuncs
+# (array path) and operator-module builtins (scalar path) so the operator
+# string is resolved per call instead of per item. The C-level operator
+# functions beat ufunc dispatch on Python scalars, and NaN compares False
+# under all of them, preserving the skip semantics for bad values.
+_FILTER_OPS = {
+    "gt": np.greater,
+    "lt": np.less,
+    "gte": np.greater_equal,
+    "lte": np.less_equal,
+    "eq": np.equal,
+}
+_FILTER_OPS_SCALAR = {
+    "gt": _op.gt,
+    "lt": _op.lt,
+    "gte": _op.ge,
+    "lte": _op.le,
+    "eq": _op.eq,
+}
+
+
+def _coerce_float(value) -> float:
+    """Coerce a field value to float, mapping missing/bad values to NaN."""
+    if value is None:
+        return float("nan")
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return float("nan")
 
 
 def filter_by_value(items: List[Dict], field: str, operator: str, threshold: float) -> List[Dict]:
     """Filter items by numeric comparison (gt, lt, gte, lte, eq)."""
-    results = []
-    for item in items:
-        value = item.get(field)
-        if value is None:
-            continue
-        try:
-            num_value = float(value)
-            if operator == "gt" and num_value > threshold:
-                results.append(item)
-            elif operator == "lt" and num_value < threshold:
-                results.append(item)
-            elif operator == "gte" and num_value >= threshold:
-                results.append(item)
-            elif operator == "lte" and num_value <= threshold:
-                results.append(item)
-            elif operator == "eq" and num_value == threshold:
-                results.append(item)
-        except (ValueError, TypeError):
-            continue
-    return results
+    op = _FILTER_OPS.get(operator)
+    if op is None:
+        return []
+
+    n = len(items)
+    if n >= 64:
+        # Large lists (thousands of labs): one C-level comparison over a
+        # packed array replaces per-item Python dispatch. NaN rows (missing
+        # or non-numeric values) compare False and drop out of the mask.
+        values = np.fromiter(
+            (_coerce_float(item.get(field)) for item in items), dtype=np.float64, count=n
+        )
+        with np.errstate(invalid="ignore"):
+            mask = op(values, threshold)
+        return [items[i] for i in np.flatnonzero(mask)]
+
+    cmp = _FILTER_OPS_SCALAR[operator]
+    return [item for item in items if cmp(_coerce_float(item.get(field)), threshold)]
+
+
+def _field_key(value) -> str:
+    """Normalize a field value to a string key, skipping str() for the
+    common case where FHIR fields are already strings."""
+    if type(value) is str:
+        return value
+    if value is None:
+        return "Unknown"
+    return str(value)
 
 
 def count_by_field(items: List[Dict], field: str) -> Dict[str, int]:
     """Count occurrences of each unique value in a field."""
-    counts = {}
-    for item in items:
-        value = str(item.get(field, "Unknown"))
-        counts[value] = counts.get(value, 0) + 1
-    return dict(sorted(counts.items(), key=lambda x: x[1], reverse=True))
+    # Counter consumes the iterable in C (_count_elements), replacing two
+    # dict operations per item with one
+    counts = Counter(_field_key(item.get(field)) for item in items)
+    return dict(counts.most_common())
 
 
 def group_by_field(items: List[Dict], field: str) -> Dict[str, List[Dict]]:
     """Group items by a field value."""
-    groups = {}
+    # defaultdict drops the extra membership probe per item
+    groups = defaultdict(list)
     for item in items:
-        key = str(item.get(field, "Unknown"))
-        if key not in groups:
-            groups[key] = []
-        groups[key].append(item)
-    return groups
+        groups[_field_key(item.get(field))].append(item)
+    return dict(groups)
 
 
 def aggregate_numeric(items: List[Dict], field: str) -> Dict[str, float]:
     """Calculate statistics for a numeric field."""
-    values = []
-    for item in items:
-        val = item.get(field)
-        if val is not None:
-            try:
-                values.append(float(val))
-            except (ValueError, TypeError):
-                continue
+    n_items = len(items)
+    if n_items >= 64:
+        # Large inputs (cohort-wide lab sweeps): pack straight into a
+        # float64 array - 8 bytes per value instead of a list of boxed
+        # Python floats - and run the reductions as NumPy C loops. NaN
+        # marks missing/non-numeric values and is compacted out once.
+        values = np.fromiter(
+            (_coerce_float(item.get(field)) for item in items), dtype=np.float64, count=n_items
+        )
+        values = values[~np.isnan(values)]
+        n = int(values.size)
+        if n == 0:
+            return {"count": 0, "min": 0, "max": 0, "mean": 0, "sum": 0}
+        total = float(values.sum())
+        return {
+            "count": n,
+            "min": float(values.min()),
+            "max": float(values.max()),
+            "mean": total / n,
+            "sum": total
+        }
 
-    if not values:
+    # Small inputs: one fused pass with running count/sum/min/max, no
+    # intermediate list at all
+    n = 0
+    total = 0.0
+    mn = float("inf")
+    mx = float("-inf")
+    for item in items:
+        f = _coerce_float(item.get(field))
+        if f != f:  # NaN marks missing/non-numeric values
+            continue
+        n += 1
+        total += f
+        if f < mn:
+            mn = f
+        if f > mx:
+            mx = f
+
+    if n == 0:
         return {"count": 0, "min": 0, "max": 0, "mean": 0, "sum": 0}
 
     return {
-        "count": len(values),
-        "min": min(values),
-        "max": max(values),
-        "mean": sum(values) / len(values),
-        "sum": sum(values)
+        "count": n,
+        "min": mn,
+        "max": mx,
+        "mean": total / n,
+        "sum": total
     }
 
 
 # Vision and Imaging Primitives
 
+# Patient name and per-patient DICOM lookups are IO-bound (bundle fetch +
+# JSON parse, bucket listing). Batch loops analyzing N images per patient
+# would otherwise repeat that work N times, so both are memoized here with
+# the same OrderedDict LRU pattern used elsewhere in the tools package.
+_PATIENT_NAME_CACHE_MAX = 512
+_patient_name_cache: "OrderedDict[str, tuple]" = OrderedDict()
+
+_PATIENT_DICOM_CACHE_MAX = 512
+_patient_dicom_cache: "OrderedDict[str, List[str]]" = OrderedDict()
+
+# The DICOM bucket listing is shared across all patients; a short TTL keeps
+# repeated scans within one request from re-listing the bucket while still
+# picking up new uploads eventually.
+_DICOM_LIST_TTL_SECONDS = 300
+_dicom_list_cache: Dict[str, Any] = {"files": None, "expires": 0.0, "index": None}
+
+# Coherent DICOM filename pattern: Given###_Family###_UUID.dcm. Parsed once
+# per listing into name/UUID lookup tables so per-patient resolution is two
+# dict probes instead of two substring scans over every filename.
+_DICOM_FILENAME_RE = re.compile(r'^([A-Za-z]+)\d*_([A-Za-z]+)\d*_([0-9a-f-]+)\.dcm$')
+
+
+def _build_dicom_index(files: List[str]) -> Dict[str, Any]:
+    """Index DICOM filenames by lowercased (given, family) and by UUID."""
+    by_name = defaultdict(list)
+    by_uuid = defaultdict(list)
+    unmatched = []
+    for filename in files:
+        match = _DICOM_FILENAME_RE.match(filename)
+        if match:
+            given, family, uuid = match.groups()
+            by_name[(given.lower(), family.lower())].append(filename)
+            by_uuid[uuid].append(filename)
+        else:
+            unmatched.append(filename)
+    return {"by_name": by_name, "by_uuid": by_uuid, "unmatched": unmatched}
+
+
+def _get_patient_name(patient_id: str) -> tuple:
+    """Return (given_name, family_name) for a patient, cached by patient_id."""
+    cached = _patient_name_cache.get(patient_id)
+    if cached is not None:
+        _patient_name_cache.move_to_end(patient_id)
+        return cached
+
+    given_name = ""
+    family_name = ""
+    bundle = load_patient_bundle(patient_id)
+    if bundle:
+        for entry in bundle.get('entry', []):
+            resource = entry.get('resource', {})
+            if resource.get('resourceType') == 'Patient':
+                names = resource.get('name', [])
+                if names:
+                    name_parts = names[0]
+                    given_name = name_parts.get('given', [''])[0] if name_parts.get('given') else ''
+                    family_name = name_parts.get('family', '')
+                break
+
+    _patient_name_cache[patient_id] = (given_name, family_name)
+    while len(_patient_name_cache) > _PATIENT_NAME_CACHE_MAX:
+        _patient_name_cache.popitem(last=False)
+    return given_name, family_name
+
+
+def _list_all_dicom_files() -> List[str]:
+    """List GCS-hosted DICOM files, memoized with a TTL."""
+    now = time.monotonic()
+    if _dicom_list_cache["files"] is not None and now < _dicom_list_cache["expires"]:
+        return _dicom_list_cache["files"]
+
+    files = gcs_list_dicom_files()
+    _dicom_list_cache["files"] = files
+    _dicom_list_cache["index"] = None  # rebuilt lazily from the fresh listing
+    _dicom_list_cache["expires"] = now + _DICOM_LIST_TTL_SECONDS
+    return files
+
+
+def _get_dicom_index() -> Dict[str, Any]:
+    """Return the filename index for the current DICOM listing."""
+    files = _list_all_dicom_files()
+    if _dicom_list_cache["index"] is None:
+        _dicom_list_cache["index"] = _build_dicom_index(files)
+    return _dicom_list_cache["index"]
+
+
+def _list_dicom_for_patient(patient_id: str) -> List[str]:
+    """Resolve a patient's DICOM filenames, cached by patient_id."""
+    cached = _patient_dicom_cache.get(patient_id)
+    if cached is not None:
+        _patient_dicom_cache.move_to_end(patient_id)
+        return cached
+
+    given_name, family_name = _get_patient_name(patient_id)
+    dicom_files = []
+
+    if USE_GCS:
+        # GCS mode: resolve against the prebuilt filename index. Synthea
+        # names carry numeric suffixes (e.g. Abe604), which the index
+        # strips, so strip them from the FHIR name before the lookup.
+        index = _get_dicom_index()
+
+        if given_name and family_name:
+            name_key = (
+                given_name.rstrip("0123456789").lower(),
+                family_name.rstrip("0123456789").lower(),
+            )
+            dicom_files = list(index["by_name"].get(name_key, ()))
+
+        # Also try matching by patient_id (the filename UUID)
+        if not dicom_files:
+            dicom_files = list(index["by_uuid"].get(patient_id, ()))
+
+        # Last resort: scan only the filenames that did not parse into
+        # the index, with one anchored case-insensitive pattern compiled
+        # outside the loop instead of two unanchored substring checks
+        # (and their per-filename .lower() copies)
+        if not dicom_files:
+            name_pattern = None
+            if given_name and family_name:
+                name_pattern = re.compile(
+                    rf'(?i)^{re.escape(given_name)}\d*_{re.escape(family_name)}\d*_'
+                )
+            for filename in index["unmatched"]:
+                if patient_id in filename or (name_pattern and name_pattern.match(filename)):
+                    dicom_files.append(filename)
+    else:
+        # Local mode: use filesystem glob
+        if given_name and family_name:
+            patterns = [
+                f"{given_name}*_{family_name}*",
+                f"*{given_name}*{family_name}*",
+            ]
+            for pattern in patterns:
+                matched_files = list(COHERENT_DICOM_PATH_ABS.glob(f"{pattern}.dcm"))
+                if matched_files:
+                    dicom_files = [str(f) for f in matched_files]
+                    break
+
+        # Fallback: try UUID direct match
+        if not dicom_files:
+            local_files = find_patient_dicom_files(COHERENT_DICOM_PATH_ABS, patient_id)
+            dicom_files = [str(f) for f in local_files]
+
+    _patient_dicom_cache[patient_id] = dicom_files
+    while len(_patient_dicom_cache) > _PATIENT_DICOM_CACHE_MAX:
+        _patient_dicom_cache.popitem(last=False)
+    return dicom_files
+
+
 def scan_dicom_directory() -> List[str]:
     """
     Scan the DICOM directory and return all DICOM filenames.
@@ -209,58 +486,10 @@ def find_patient_images(patient_id: str) -> Dict[str, Any]:
         Dictionary with 'dicom_files' (list of filenames) and 'has_ecg' (bool)
     """
     try:
-        # Load patient FHIR bundle to get demographics
-        bundle = load_patient_bundle(patient_id)
-        dicom_files = []
-        given_name = ""
-        family_name = ""
-
-        if bundle:
-            # Extract patient name from FHIR bundle
-            patient_resources = [entry.get('resource') for entry in bundle.get('entry', [])
-                                 if entry.get('resource', {}).get('resourceType') == 'Patient']
-
-            if patient_resources:
-                patient = patient_resources[0]
-                names = patient.get('name', [])
-                if names:
-                    name_parts = names[0]
-                    given_name = name_parts.get('given', [''])[0] if name_parts.get('given') else ''
-                    family_name = name_parts.get('family', '')
-
-        if USE_GCS:
-            # GCS mode: search through GCS-hosted DICOM files
-            all_dicom_files = gcs_list_dicom_files()
-
-            # Match by patient name pattern in filename
-            if given_name and family_name:
-                for filename in all_dicom_files:
-                    # DICOM filename pattern: Given###_Family###_UUID.dcm
-                    if given_name.lower() in filename.lower() and family_name.lower() in filename.lower():
-                        dicom_files.append(filename)
-
-            # Also try matching by patient_id in filename
-            if not dicom_files:
-                for filename in all_dicom_files:
-                    if patient_id in filename:
-                        dicom_files.append(filename)
-        else:
-            # Local mode: use filesystem glob
-            if given_name and family_name:
-                patterns = [
-                    f"{given_name}*_{family_name}*",
-                    f"*{given_name}*{family_name}*",
-                ]
-                for pattern in patterns:
-                    matched_files = list(COHERENT_DICOM_PATH_ABS.glob(f"{pattern}.dcm"))
-                    if matched_files:
-                        dicom_files = [str(f) for f in matched_files]
-                        break
-
-            # Fallback: try UUID direct match
-            if not dicom_files:
-                local_files = find_patient_dicom_files(COHERENT_DICOM_PATH_ABS, patient_id)
-                dicom_files = [str(f) for f in local_files]
+        # Name extraction and filename matching are cached by patient_id,
+        # so repeated lookups for the same patient skip the bundle load
+        # and the DICOM listing scan entirely.
+        dicom_files = _list_dicom_for_patient(patient_id)
 
         # Check for ECG (works in both modes now)
         has_ecg = False
@@ -280,7 +509,80 @@ def find_patient_images(patient_id: str) -> Dict[str, Any]:
         return {"error": str(e), "dicom_files": [], "dicom_count": 0, "has_ecg": False}
 
 
-def load_dicom_image(patient_id: str, image_index: int = 0) -> Optional[str]:
+# Converted PNGs cached by (path, mtime, size, quality): agent flows analyze
+# the same DICOM repeatedly with different prompts, and each conversion is a
+# download plus a CPU-bound decode/re-encode. Eviction is byte-bounded rather
+# than entry-bounded because payload sizes vary widely (from ~200KB optimized
+# PNGs up to multi-MB renders).
+_DICOM_PNG_CACHE_MAX_BYTES = 512 * 1024 * 1024
+_dicom_png_cache: "OrderedDict[tuple, str]" = OrderedDict()
+_dicom_png_cache_bytes = 0
+
+
+def _dicom_png_key(path: str, target_size: tuple, quality: int) -> tuple:
+    """Build the PNG cache key for a path (mtime-stamped for local files).
+
+    Oversized requests are normalized so (2000, 2000) and (1568, 1568)
+    share one cache entry - the converters clamp to the same edge anyway.
+    """
+    target_size = (min(target_size[0], CLAUDE_MAX_EDGE), min(target_size[1], CLAUDE_MAX_EDGE))
+
+    if USE_GCS:
+        mtime = None
+    else:
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            mtime = None
+
+    return (path, mtime, target_size, quality)
+
+
+def _touch_cached_png(path: str, target_size: tuple = (800, 800), quality: int = 85) -> None:
+    """Refresh a cache entry's LRU position without loading anything."""
+    key = _dicom_png_key(path, target_size, quality)
+    if key in _dicom_png_cache:
+        _dicom_png_cache.move_to_end(key)
+
+
+def _cached_dicom_png(path: str, target_size: tuple = (800, 800), quality: int = 85) -> Optional[str]:
+    """Convert a DICOM (GCS filename or local path) to base64 PNG, cached.
+
+    Local paths carry their mtime in the key so an overwritten file
+    auto-invalidates; GCS objects are immutable in practice and stay
+    keyed by name alone.
+    """
+    global _dicom_png_cache_bytes
+
+    key = _dicom_png_key(path, target_size, quality)
+    cached = _dicom_png_cache.get(key)
+    if cached is not None:
+        _dicom_png_cache.move_to_end(key)
+        return cached
+
+    if USE_GCS:
+        png = convert_dicom_to_png_from_gcs(path, target_size=target_size)
+    else:
+        png = dicom_to_base64_png(path, target_size=target_size, quality=quality)
+
+    if png is not None:
+        _dicom_png_cache[key] = png
+        _dicom_png_cache_bytes += len(png)
+        while _dicom_png_cache_bytes > _DICOM_PNG_CACHE_MAX_BYTES:
+            _, evicted = _dicom_png_cache.popitem(last=False)
+            _dicom_png_cache_bytes -= len(evicted)
+    return png
+
+
+def clear_dicom_cache() -> None:
+    """Drop cached PNG renderings (call after uploading new DICOM files)."""
+    global _dicom_png_cache_bytes
+    _dicom_png_cache.clear()
+    _dicom_png_cache_bytes = 0
+
+
+def load_dicom_image(patient_id: str, image_index: int = 0,
+                     max_edge: Optional[int] = None) -> Optional[str]:
     """
     Load a DICOM image for a patient as optimized base64 PNG.
     Works with both local and GCS storage.
@@ -288,96 +590,158 @@ def load_dicom_image(patient_id: str, image_index: int = 0) -> Optional[str]:
     Args:
         patient_id: Patient UUID
         image_index: Which image to load (0 for first, 1 for second, etc.)
+        max_edge: Optional maximum pixel edge for the converted PNG
+            (default 800; capped at Claude's ~1568px vision tiling limit)
 
     Returns:
         Base64-encoded PNG string, or None if not found
     """
     try:
-        # First find the patient's DICOM files
-        image_info = find_patient_images(patient_id)
-        dicom_files = image_info.get("dicom_files", [])
+        # Resolve filenames through the per-patient cache; no bundle reload
+        # or ECG probe on repeated image loads
+        dicom_files = _list_dicom_for_patient(patient_id)
 
         if not dicom_files or image_index >= len(dicom_files):
             return None
 
         filename = dicom_files[image_index]
 
-        if USE_GCS:
-            # Use GCS conversion function
-            return convert_dicom_to_png_from_gcs(filename)
-        else:
-            # Local mode: use local file path
-            return dicom_to_base64_png(filename, target_size=(800, 800), quality=85)
+        # Conversion result is cached; repeat analyses of the same image
+        # skip the download and the decode/re-encode entirely
+        target_size = (max_edge, max_edge) if max_edge else (800, 800)
+
+        # Position-aware eviction bias: walking through a series revisits
+        # adjacent indices constantly, so refresh already-cached neighbors
+        # of the active slice (touched first, so the active slice itself
+        # stays freshest)
+        for neighbor in (image_index - 1, image_index + 1):
+            if 0 <= neighbor < len(dicom_files):
+                _touch_cached_png(dicom_files[neighbor], target_size=target_size)
+
+        return _cached_dicom_png(filename, target_size=target_size)
 
     except Exception as e:
         print(f"Error loading DICOM image: {e}")
         return None
 
 
-def load_dicom_image_by_filename(filename: str) -> Optional[str]:
+def load_dicom_images_batch(patient_ids: List[str], image_index: int = 0,
+                            max_workers: int = 16) -> List[Optional[str]]:
+    """
+    Load one DICOM image per patient concurrently.
+
+    Filename resolution hits the per-patient cache, then the downloads
+    and PNG conversions fan out over a thread pool so the per-image
+    latency overlaps. Results are aligned with the input order (None
+    where a patient has no image at that index).
+
+    Args:
+        patient_ids: Patient UUIDs
+        image_index: Which image to load for each patient
+        max_workers: Maximum concurrent loads
+
+    Returns:
+        List of base64 PNG strings (or None), one per patient
+
+    Example:
+        images = load_dicom_images_batch(patient_ids)
+        images = [img for img in images if img]
+        if images:
+            analysis = analyze_multiple_images_with_llm(images, "Compare these MRIs")
+    """
+    if not patient_ids:
+        return []
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(patient_ids))) as executor:
+        return list(executor.map(lambda pid: load_dicom_image(pid, image_index), patient_ids))
+
+
+def load_dicom_image_by_filename(filename: str, max_edge: Optional[int] = None) -> Optional[str]:
     """
     Load a DICOM image by filename (for direct file access).
     Works with both local and GCS storage.
 
     Args:
         filename: DICOM filename
+        max_edge: Optional maximum pixel edge for the converted PNG
+            (default 800; capped at Claude's ~1568px vision tiling limit)
 
     Returns:
         Base64-encoded PNG string, or None if not found
     """
     try:
+        target_size = (max_edge, max_edge) if max_edge else (800, 800)
         if USE_GCS:
-            return convert_dicom_to_png_from_gcs(filename)
+            return _cached_dicom_png(filename, target_size=target_size)
         else:
             # Local mode: construct full path
             filepath = COHERENT_DICOM_PATH_ABS / filename
             if filepath.exists():
-                return dicom_to_base64_png(str(filepath), target_size=(800, 800), quality=85)
+                return _cached_dicom_png(str(filepath), target_size=target_size)
             return None
     except Exception as e:
         print(f"Error loading DICOM image by filename: {e}")
         return None
 
 
-def _extract_ecg_from_csv_content(csv_content: str, patient_id: str) -> Optional[str]:
+def _extract_ecg_from_csv_stream(fileobj, patient_id: str) -> Optional[str]:
     """
-    Extract ECG base64 image from observations.csv content.
+    Extract ECG base64 image from an open observations.csv stream.
+
+    Lines are prefiltered with a C-level substring check on the raw text
+    before any CSV parsing, so per-row field splitting only happens for
+    the handful of candidate rows. Coherent CSV rows never embed
+    newlines, so line == row holds.
 
     Args:
-        csv_content: Raw CSV content as string
+        fileobj: Text-mode file object positioned at the CSV header
         patient_id: Patient UUID to find
 
     Returns:
         Base64-encoded PNG string, or None if not found
     """
     import csv
-    from io import StringIO
 
     try:
-        reader = csv.DictReader(StringIO(csv_content))
+        header_line = fileobj.readline()
+        if not header_line:
+            return None
+        columns = {name: i for i, name in enumerate(next(csv.reader([header_line])))}
+        patient_idx = columns.get('PATIENT')
+        code_idx = columns.get('CODE')
+        description_idx = columns.get('DESCRIPTION')
+        value_idx = columns.get('VALUE')
+        if patient_idx is None:
+            return None
 
-        for row in reader:
-            # ECG observations have LOINC code 29303009 (Electrocardiographic procedure)
-            # or contain base64-encoded image data in the VALUE field
-            row_patient = row.get('PATIENT', '')
+        for line in fileobj:
+            # 99%+ of rows belong to other patients; skip them before
+            # paying for CSV parsing
+            if patient_id not in line:
+                continue
 
-            if patient_id in row_patient:
-                # Check for ECG observation
-                description = row.get('DESCRIPTION', '').lower()
-                code = row.get('CODE', '')
-                value = row.get('VALUE', '')
-
-                # ECG entries typically have base64 PNG data
-                if 'electrocardiogram' in description or code == '29303009':
-                    # Value should contain base64 PNG data
-                    if value and len(value) > 100:  # Base64 images are typically long
-                        # Check if it's base64 encoded
-                        if value.startswith('data:image'):
-                            # Extract base64 from data URL
-                            return value.split(',')[1] if ',' in value else value
-                        else:
-                            # Assume raw base64
-                            return value
+            row = next(csv.reader([line]))
+            if patient_idx >= len(row) or patient_id not in row[patient_idx]:
+                continue
+
+            # Check for ECG observation
+            description = row[description_idx].lower() if description_idx is not None and description_idx < len(row) else ''
+            code = row[code_idx] if code_idx is not None and code_idx < len(row) else ''
+            value = row[value_idx] if value_idx is not None and value_idx < len(row) else ''
+
+            # ECG entries typically have base64 PNG data
+            if 'electrocardiogram' in description or code == '29303009':
+                # Value should contain base64 PNG data
+                if value and len(value) > 100:  # Base64 images are typically long
+                    # Check if it's base64 encoded
+                    if value.startswith('data:image'):
+                        # Slice past the first comma instead of
+                        # splitting the multi-KB payload into a list
+                        idx = value.find(',')
+                        return value[idx + 1:] if idx != -1 else value
+                    else:
+                        # Assume raw base64
+                        return value
 
         return None
     except Exception as e:
@@ -385,6 +749,99 @@ def _extract_ecg_from_csv_content(csv_content: str, patient_id: str) -> Optional
         return None
 
 
+# ECG rows are a tiny fraction of observations.csv, but every per-patient
+# scan walks the whole file. One streaming pass collects just the ECG
+# base64 payloads keyed by patient, making every later lookup O(1) -
+# cohort screens go from O(patients * rows) to one pass. In local mode
+# the index is pickled next to the CSV so later processes skip the scan
+# too; the pickle is invalidated when the CSV's size or mtime changes.
+_ecg_index: Optional[Dict[str, str]] = None
+
+
+def _build_ecg_index() -> Dict[str, str]:
+    """Stream observations.csv once, collecting ECG base64 per patient."""
+    import csv
+
+    index: Dict[str, str] = {}
+    fileobj = gcs_stream_csv_file("observations.csv")
+    if fileobj is None:
+        return index
+
+    try:
+        header_line = fileobj.readline()
+        if not header_line:
+            return index
+        columns = {name: i for i, name in enumerate(next(csv.reader([header_line])))}
+        patient_idx = columns.get('PATIENT')
+        code_idx = columns.get('CODE')
+        description_idx = columns.get('DESCRIPTION')
+        value_idx = columns.get('VALUE')
+
+        for line in fileobj:
+            # ECG rows are rare; a raw substring check on the line skips
+            # the CSV parse for everything else. The marker variants
+            # cover Electrocardiogram/electrocardiogram/ELECTROCARDIOGRAM.
+            if (
+                '29303009' not in line
+                and 'lectrocardiogra' not in line
+                and 'LECTROCARDIOGRA' not in line
+            ):
+                continue
+
+            row = next(csv.reader([line]))
+            description = row[description_idx].lower() if description_idx is not None and description_idx < len(row) else ''
+            code = row[code_idx] if code_idx is not None and code_idx < len(row) else ''
+            if 'electrocardiogram' not in description and code != '29303009':
+                continue
+            value = row[value_idx] if value_idx is not None and value_idx < len(row) else ''
+            if value and len(value) > 100:
+                if value.startswith('data:image'):
+                    idx = value.find(',')
+                    if idx != -1:
+                        value = value[idx + 1:]
+                patient = row[patient_idx] if patient_idx is not None and patient_idx < len(row) else ''
+                index[patient] = value
+    finally:
+        fileobj.close()
+
+    return index
+
+
+def _get_ecg_index() -> Dict[str, str]:
+    """Return the patient->ECG index, building or unpickling it on first use."""
+    global _ecg_index
+    if _ecg_index is not None:
+        return _ecg_index
+
+    import pickle
+
+    csv_path = COHERENT_CSV_PATH_ABS / "observations.csv"
+    cache_path = COHERENT_CSV_PATH_ABS / "observations.ecg_index.pkl"
+    signature = None
+    if not USE_GCS and csv_path.exists():
+        stat = csv_path.stat()
+        signature = (stat.st_size, stat.st_mtime)
+        try:
+            with open(cache_path, 'rb') as f:
+                cached = pickle.load(f)
+            if cached.get("signature") == signature:
+                _ecg_index = cached["index"]
+                return _ecg_index
+        except (OSError, pickle.PickleError, KeyError, AttributeError, EOFError):
+            pass  # missing or stale cache; rebuild below
+
+    _ecg_index = _build_ecg_index()
+
+    if signature is not None:
+        try:
+            with open(cache_path, 'wb') as f:
+                pickle.dump({"signature": signature, "index": _ecg_index}, f)
+        except OSError:
+            pass  # read-only data directory; in-memory index still works
+
+    return _ecg_index
+
+
 def load_ecg_image(patient_id: str) -> Optional[str]:
     """
     Load ECG image for a patient from observations.csv.
@@ -397,16 +854,17 @@ def load_ecg_image(patient_id: str) -> Optional[str]:
         Base64-encoded PNG string, or None if not found
     """
     try:
-        if USE_GCS:
-            # Load observations.csv from GCS and parse ECG
-            csv_content = gcs_load_csv_file("observations.csv")
-            if csv_content:
-                return _extract_ecg_from_csv_content(csv_content, patient_id)
-            return None
-        else:
-            # Local mode
-            ecg_path = COHERENT_CSV_PATH_ABS / "observations.csv"
-            return load_ecg_image_from_csv(ecg_path, patient_id)
+        index = _get_ecg_index()
+        ecg = index.get(patient_id)
+        if ecg is not None:
+            return ecg
+
+        # PATIENT values may embed the UUID in a longer token; the index
+        # holds only ECG rows, so this fallback scan is tiny
+        for row_patient, value in index.items():
+            if patient_id in row_patient:
+                return value
+        return None
     except Exception as e:
         print(f"Error loading ECG image: {e}")
         return None
@@ -425,9 +883,9 @@ def get_dicom_metadata(patient_id: str, image_index: int = 0) -> Dict[str, Any]:
         Dictionary with modality, study description, dimensions, etc.
     """
     try:
-        # First find the patient's DICOM files
-        image_info = find_patient_images(patient_id)
-        dicom_files = image_info.get("dicom_files", [])
+        # Resolve filenames through the per-patient cache; no bundle reload
+        # or ECG probe on repeated metadata lookups
+        dicom_files = _list_dicom_for_patient(patient_id)
 
         if not dicom_files or image_index >= len(dicom_files):
             return {"error": "Image not found", "patient_id": patient_id}
@@ -475,6 +933,33 @@ def get_dicom_metadata_from_path(dicom_path: str) -> Dict[str, Any]:
         return {"error": str(e), "path": dicom_path}
 
 
+def get_dicom_metadata_batch(dicom_paths: List[str], max_workers: int = 20) -> List[Dict[str, Any]]:
+    """
+    Get metadata for several DICOM files concurrently.
+
+    Each metadata read is an independent blob fetch in GCS mode, so the
+    per-file latency overlaps across a thread pool instead of adding up
+    serially. Results are aligned with the input order.
+
+    Args:
+        dicom_paths: DICOM file paths (local) or filenames (GCS)
+        max_workers: Maximum concurrent fetches
+
+    Returns:
+        List of metadata dictionaries, one per input path
+
+    Example:
+        dicom_files = scan_dicom_directory()
+        metadata_list = get_dicom_metadata_batch(dicom_files[:50])
+        modalities = count_by_field(metadata_list, "modality")
+    """
+    if not dicom_paths:
+        return []
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(dicom_paths))) as executor:
+        return list(executor.map(get_dicom_metadata_from_path, dicom_paths))
+
+
 def analyze_image_with_llm(image_base64: str, prompt: str) -> str:
     """
     Analyze a medical image using Claude's vision API.
@@ -513,6 +998,33 @@ def analyze_image_with_llm(image_base64: str, prompt: str) -> str:
         return f"Vision analysis error: {str(e)}"
 
 
+# Structured ECG report fields, parsed with one precompiled regex in a
+# single pass over the response instead of six per-field re.search calls
+# (each of which used to build and compile its pattern on the fly).
+_ECG_FIELD_NAMES = (
+    "RHYTHM",
+    "R-R INTERVALS",
+    "P WAVES",
+    "BASELINE",
+    "CLINICAL SIGNIFICANCE",
+    "CONFIDENCE",
+)
+_ECG_FIELDS_RE = re.compile(
+    r'(' + '|'.join(re.escape(name) for name in _ECG_FIELD_NAMES) + r'):\s*(.+?)(?:\n|$)',
+    re.IGNORECASE,
+)
+
+
+def _parse_ecg_fields(text: str) -> Dict[str, str]:
+    """Parse FIELD: value lines from a structured ECG analysis response."""
+    fields: Dict[str, str] = {}
+    for match in _ECG_FIELDS_RE.finditer(text):
+        name = match.group(1).upper()
+        if name not in fields:  # keep the first occurrence, like re.search did
+            fields[name] = match.group(2).strip()
+    return fields
+
+
 def analyze_ecg_for_rhythm(patient_id: str, clinical_context: str = "") -> Dict[str, Any]:
     """
     Analyze ECG image for cardiac rhythm with structured parsing.
@@ -587,20 +1099,14 @@ Be precise in your RHYTHM classification. Only state "Atrial Fibrillation" if yo
 
         raw_text = response["content"] if isinstance(response, dict) else str(response)
 
-        # Parse structured response with better logic
-        def extract_field(text: str, field_name: str) -> str:
-            """Extract value after 'FIELD_NAME:' line"""
-            import re
-            pattern = rf'{field_name}:\s*(.+?)(?:\n|$)'
-            match = re.search(pattern, text, re.IGNORECASE)
-            return match.group(1).strip() if match else "Unknown"
-
-        rhythm = extract_field(raw_text, "RHYTHM")
-        rr_intervals = extract_field(raw_text, "R-R INTERVALS")
-        p_waves = extract_field(raw_text, "P WAVES")
-        baseline = extract_field(raw_text, "BASELINE")
-        significance = extract_field(raw_text, "CLINICAL SIGNIFICANCE")
-        confidence = extract_field(raw_text, "CONFIDENCE")
+        # Parse all structured fields in one pass over the response
+        fields = _parse_ecg_fields(raw_text)
+        rhythm = fields.get("RHYTHM", "Unknown")
+        rr_intervals = fields.get("R-R INTERVALS", "Unknown")
+        p_waves = fields.get("P WAVES", "Unknown")
+        baseline = fields.get("BASELINE", "Unknown")
+        significance = fields.get("CLINICAL SIGNIFICANCE", "Unknown")
+        confidence = fields.get("CONFIDENCE", "Unknown")
 
         # Determine AFib based on RHYTHM field, not keyword matching
         afib_detected = False
@@ -661,7 +1167,7 @@ def analyze_multiple_images_with_llm(images: List[str], prompt: str) -> str:
         Vision analysis as text
 
     Example:
-        images = [load_dicom_image(pid, 0) for pid in patient_ids]
+        images = load_dicom_images_batch(patient_ids)  # concurrent fetches
         images = [img for img in images if img]  # Remove None values
         if images:
             analysis = analyze_multiple_images_with_llm(
@@ -672,8 +1178,20 @@ def analyze_multiple_images_with_llm(images: List[str], prompt: str) -> str:
     try:
         from medster.model import call_llm
 
-        # Filter out None values
-        valid_images = [img for img in images if img]
+        # Filter out None values and deduplicate: identical images (e.g.
+        # the same ECG loaded twice for a cohort comparison) would cost
+        # payload bytes and vision tokens linearly per copy. blake2b over
+        # the base64 is cheap relative to either.
+        seen = set()
+        valid_images = []
+        for img in images:
+            if not img:
+                continue
+            digest = hashlib.blake2b(img.encode("ascii"), digest_size=8).digest()
+            if digest in seen:
+                continue
+            seen.add(digest)
+            valid_images.append(img)
 
         if not valid_images:
             return "No valid images to analyze"
@@ -720,6 +1238,11 @@ get_medications(bundle: Dict) -> List[Dict]
 filter_by_text(items: List, field: str, search_text: str) -> List[Dict]
     # Filter where field contains text (case-insensitive)
 
+filter_by_text_batch(items: List, field: str, search_texts: List[str]) -> Dict[str, List]
+    # Filter with SEVERAL terms in one pass over the items
+    # Returns: {term: matching_items} - prefer over repeated filter_by_text calls
+    # Example: hits = filter_by_text_batch(conditions, "name", ["diabetes", "hypertension"])
+
 filter_by_value(items: List, field: str, operator: str, threshold: float) -> List[Dict]
     # operator: "gt", "lt", "gte", "lte", "eq"
 
@@ -746,6 +1269,11 @@ get_dicom_metadata_from_path(dicom_path: str) -> Dict
     # Use with scan_dicom_directory() for fast metadata extraction
     # Example: metadata = get_dicom_metadata_from_path(dicom_files[0])
 
+get_dicom_metadata_batch(dicom_paths: List[str], max_workers: int = 20) -> List[Dict]
+    # Get metadata for MANY DICOM files concurrently (results in input order)
+    # PREFER THIS over a get_dicom_metadata_from_path loop - fetches overlap
+    # Example: metadata_list = get_dicom_metadata_batch(dicom_files[:50])
+
 find_patient_images(patient_id: str) -> Dict
     # Returns: {"dicom_files": List[str], "dicom_count": int, "has_ecg": bool}
     # Find all available images for a patient
@@ -755,6 +1283,11 @@ load_dicom_image(patient_id: str, image_index: int = 0) -> Optional[str]
     # image_index: 0 for first image, 1 for second, etc.
     # Returns base64 string ready for vision analysis
 
+load_dicom_images_batch(patient_ids: List[str], image_index: int = 0) -> List[Optional[str]]
+    # Load one DICOM image per patient CONCURRENTLY (results in input order)
+    # PREFER THIS over a load_dicom_image loop when comparing patients
+    # Example: images = [img for img in load_dicom_images_batch(pids) if img]
+
 load_ecg_image(patient_id: str) -> Optional[str]
     # Load ECG image as base64 PNG string from observations.csv
     # Returns base64 string ready for vision analysis
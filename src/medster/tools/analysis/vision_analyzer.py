@@ -6,12 +6,24 @@ from langchain.tools import tool
 from pydantic import BaseModel, Field
 from typing import List, Dict, Any, Optional
 import json
-
-from medster.model import call_llm
+import os
+import re
+import string
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+try:  # optional accelerator; stdlib json is the fallback
+    import orjson as _orjson
+except ImportError:
+    _orjson = None
+
+from medster.model import call_llm, call_llm_many
 from medster.tools.analysis.primitives import (
     load_ecg_image,
     load_dicom_image,
     load_dicom_image_by_filename,
+    load_dicom_images_batch,
     find_patient_images,
     get_dicom_metadata,
     get_dicom_metadata_from_path,
@@ -19,6 +31,128 @@ from medster.tools.analysis.primitives import (
     analyze_ecg_for_rhythm
 )
 
+# Anthropic caps a single vision request at 100 images
+_MAX_IMAGES_PER_REQUEST = 100
+
+# Repeated questions about the same scan re-read the DICOM header each
+# time to extract modality/body part; cache resolved metadata instead.
+# Source DICOM files are effectively immutable, so a simple LRU is safe.
+_metadata_cache: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+_METADATA_CACHE_MAX = 4096
+
+
+def _cached_metadata(patient_id: str, image_index: int = 0) -> Dict[str, Any]:
+    """get_dicom_metadata with an LRU cache keyed by (patient_id, image_index)."""
+    key = (patient_id, image_index)
+    cached = _metadata_cache.get(key)
+    if cached is not None:
+        _metadata_cache.move_to_end(key)
+        return cached
+
+    metadata = get_dicom_metadata(patient_id, image_index)
+    if not metadata.get("error"):
+        _metadata_cache[key] = metadata
+        if len(_metadata_cache) > _METADATA_CACHE_MAX:
+            _metadata_cache.popitem(last=False)
+    return metadata
+
+
+def _cached_metadata_path(filename: str) -> Dict[str, Any]:
+    """get_dicom_metadata_from_path with an LRU cache keyed by (path, mtime).
+
+    Local files carry their mtime in the key so an overwritten file
+    auto-invalidates; GCS filenames have no local stat and stay keyed
+    by name alone.
+    """
+    try:
+        mtime = os.stat(filename).st_mtime
+    except OSError:
+        mtime = None
+    key = (filename, mtime)
+    cached = _metadata_cache.get(key)
+    if cached is not None:
+        _metadata_cache.move_to_end(key)
+        return cached
+
+    metadata = get_dicom_metadata_from_path(filename)
+    if not metadata.get("error"):
+        _metadata_cache[key] = metadata
+        if len(_metadata_cache) > _METADATA_CACHE_MAX:
+            _metadata_cache.popitem(last=False)
+    return metadata
+
+
+def clear_metadata_cache() -> None:
+    """Drop cached DICOM metadata (call after uploading new DICOM files)."""
+    _metadata_cache.clear()
+
+
+# find_patient_images rescans the image sources on every call, and within
+# a conversation the same patient is queried repeatedly. Cache results for
+# a short TTL so new uploads still become visible within five minutes.
+_FIND_CACHE_TTL_SECONDS = 300
+_FIND_CACHE_MAX = 1024
+_find_cache: "OrderedDict[str, tuple]" = OrderedDict()  # pid -> (expires, info)
+
+
+def _cached_find(patient_id: str) -> Dict[str, Any]:
+    """find_patient_images with a TTL-bounded LRU cache."""
+    now = time.time()
+    entry = _find_cache.get(patient_id)
+    if entry is not None and entry[0] > now:
+        _find_cache.move_to_end(patient_id)
+        return entry[1]
+
+    info = find_patient_images(patient_id)
+    if not info.get("error"):
+        _find_cache[patient_id] = (now + _FIND_CACHE_TTL_SECONDS, info)
+        while len(_find_cache) > _FIND_CACHE_MAX:
+            _find_cache.popitem(last=False)
+    return info
+
+
+def invalidate_patient_cache(patient_id: Optional[str] = None) -> None:
+    """Drop cached image listings for one patient (or all of them).
+
+    Upload handlers should call this so a fresh DICOM shows up before
+    the TTL lapses.
+    """
+    if patient_id is None:
+        _find_cache.clear()
+    else:
+        _find_cache.pop(patient_id, None)
+
+
+# Prompt templates are parsed once at import; each call pays only for a
+# substitute() over the placeholders instead of rebuilding the full text
+_DICOM_PROMPT = string.Template("""Analyze this medical image for clinical decision support.
+
+Patient ID: $patient_id
+Modality: $modality
+Body Part: $body_part
+Study Description: $study_desc$context_str
+
+Clinical Question: $clinical_question
+
+Provide:
+1. Image quality assessment
+2. Key anatomical structures visible
+3. Abnormal findings (masses, hemorrhage, fractures, etc.)
+4. Direct answer to the clinical question
+5. Any critical findings requiring immediate attention
+
+Be specific and clinically relevant.""")
+
+_DICOM_FILE_PROMPT = string.Template("""Analyze this medical image.
+
+Filename: $filename
+Modality: $modality
+Body Part: $body_part$context_str
+
+$clinical_question
+
+Provide specific clinical findings.""")
+
 
 class PatientDICOMAnalysisInput(BaseModel):
     """Input schema for patient DICOM analysis."""
@@ -38,6 +172,14 @@ class PatientDICOMAnalysisInput(BaseModel):
         default="",
         description="Optional clinical context (e.g., 'Patient with history of stroke')"
     )
+    max_edge: Optional[int] = Field(
+        default=None,
+        description="Maximum pixel edge for the converted image (default 800, up to 1568). Increase for fine-grained findings."
+    )
+    verbose: bool = Field(
+        default=False,
+        description="Include full metadata and study details in the result (larger payload)"
+    )
 
 
 class DICOMFileAnalysisInput(BaseModel):
@@ -54,6 +196,10 @@ class DICOMFileAnalysisInput(BaseModel):
         default="",
         description="Optional clinical context"
     )
+    max_edge: Optional[int] = Field(
+        default=None,
+        description="Maximum pixel edge for the converted image (default 800, up to 1568). Increase for fine-grained findings."
+    )
 
 
 @tool(args_schema=PatientDICOMAnalysisInput)
@@ -61,7 +207,9 @@ def analyze_patient_dicom(
     patient_id: str,
     clinical_question: str = "Analyze this medical image and describe any abnormal findings, masses, hemorrhage, or other clinically significant observations",
     image_index: int = 0,
-    clinical_context: str = ""
+    clinical_context: str = "",
+    max_edge: Optional[int] = None,
+    verbose: bool = False
 ) -> dict:
     """
     Analyze a patient's DICOM image using Claude's vision API.
@@ -78,8 +226,35 @@ def analyze_patient_dicom(
     Returns structured analysis with findings and metadata.
     """
     try:
-        # Find patient's images
-        image_info = find_patient_images(patient_id)
+        # The three loaders are independent I/O (directory scan, header
+        # read, pixel download + PNG conversion); run them concurrently so
+        # wall time is the slowest of the three instead of their sum
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            info_future = executor.submit(_cached_find, patient_id)
+            metadata_future = executor.submit(_cached_metadata, patient_id, image_index)
+
+            image_info = info_future.result()
+
+            # URL fast path: when the GCS layer reports an already-converted
+            # PNG, reference it by URL and skip the pixel download + base64
+            # encode entirely (also lifts the 5 MB base64 cap to 20 MB)
+            png_url = image_info.get("gcs_png_url")
+            image_future = None
+            if not png_url:
+                image_future = executor.submit(load_dicom_image, patient_id, image_index, max_edge)
+
+            # A metadata or image failure should not mask the clearer
+            # "no images found" errors below
+            try:
+                metadata = metadata_future.result()
+            except Exception:
+                metadata = {}
+            image_base64 = None
+            if image_future is not None:
+                try:
+                    image_base64 = image_future.result()
+                except Exception:
+                    image_base64 = None
 
         if image_info.get("error"):
             return {
@@ -95,13 +270,7 @@ def analyze_patient_dicom(
                 "error": "No DICOM images found for this patient"
             }
 
-        # Get metadata
-        metadata = get_dicom_metadata(patient_id, image_index)
-
-        # Load image as base64 PNG
-        image_base64 = load_dicom_image(patient_id, image_index)
-
-        if not image_base64:
+        if not image_base64 and not png_url:
             return {
                 "status": "error",
                 "patient_id": patient_id,
@@ -115,45 +284,44 @@ def analyze_patient_dicom(
         body_part = metadata.get("body_part", "Unknown")
         study_desc = metadata.get("study_description", "Unknown")
 
-        prompt = f"""Analyze this medical image for clinical decision support.
-
-Patient ID: {patient_id}
-Modality: {modality}
-Body Part: {body_part}
-Study Description: {study_desc}{context_str}
-
-Clinical Question: {clinical_question}
-
-Provide:
-1. Image quality assessment
-2. Key anatomical structures visible
-3. Abnormal findings (masses, hemorrhage, fractures, etc.)
-4. Direct answer to the clinical question
-5. Any critical findings requiring immediate attention
-
-Be specific and clinically relevant."""
+        prompt = _DICOM_PROMPT.substitute(
+            patient_id=patient_id,
+            modality=modality,
+            body_part=body_part,
+            study_desc=study_desc,
+            context_str=context_str,
+            clinical_question=clinical_question,
+        )
 
         # Call vision API
         response = call_llm(
             prompt=prompt,
-            images=[image_base64],
+            images=[image_base64] if image_base64 else None,
+            image_urls=[png_url] if png_url else None,
             model="claude-sonnet-4-5-20250929"
         )
 
         analysis_text = response["content"] if isinstance(response, dict) else str(response)
 
-        return {
+        # Tool results are re-serialized into agent context on every later
+        # turn, so the default payload stays minimal; verbose restores the
+        # full metadata for callers that need it
+        result = {
             "status": "success",
             "patient_id": patient_id,
             "image_index": image_index,
-            "total_images": image_info.get("dicom_count", 0),
             "modality": modality,
             "body_part": body_part,
-            "study_description": study_desc,
-            "clinical_question": clinical_question,
-            "vision_analysis": analysis_text,
-            "metadata": metadata
+            "vision_analysis": analysis_text
         }
+        if verbose:
+            result.update({
+                "total_images": image_info.get("dicom_count", 0),
+                "study_description": study_desc,
+                "clinical_question": clinical_question,
+                "metadata": metadata
+            })
+        return result
 
     except Exception as e:
         return {
@@ -163,11 +331,170 @@ Be specific and clinically relevant."""
         }
 
 
+class PatientDICOMBatchAnalysisInput(BaseModel):
+    """Input schema for batched patient DICOM analysis."""
+
+    patient_ids: List[str] = Field(
+        description="Patient UUIDs to analyze DICOM images for (one image each)"
+    )
+    clinical_question: str = Field(
+        default="Analyze each medical image and describe any abnormal findings, masses, hemorrhage, or other clinically significant observations",
+        description="Clinical question applied to every image in the batch"
+    )
+    image_index: int = Field(
+        default=0,
+        description="Which image to analyze for each patient (0 for first)"
+    )
+    clinical_context: str = Field(
+        default="",
+        description="Optional clinical context shared by the whole batch"
+    )
+
+
+_BATCH_SECTION_RE = re.compile(r"===\s*Image\s+(\d+)\s*===")
+
+
+def _split_batch_analysis(analysis_text: str, count: int) -> List[str]:
+    """
+    Map the '=== Image k ===' sections of a batched vision response
+    back to per-image analysis strings by image index.
+    """
+    matches = list(_BATCH_SECTION_RE.finditer(analysis_text))
+    sections: Dict[int, str] = {}
+    for pos, match in enumerate(matches):
+        end = matches[pos + 1].start() if pos + 1 < len(matches) else len(analysis_text)
+        sections[int(match.group(1))] = analysis_text[match.end():end].strip()
+
+    if not sections:
+        # Model ignored the section markers - return the full text for each image
+        return [analysis_text] * count
+
+    return [sections.get(i + 1, "") for i in range(count)]
+
+
+def _build_batch_prompt(chunk: List[tuple], clinical_question: str, clinical_context: str) -> str:
+    """Build the enumerated multi-image prompt for one request-sized chunk."""
+    context_str = f"\nClinical context: {clinical_context}" if clinical_context else ""
+    image_lines = "\n".join(
+        f"- Image {i + 1} -> Patient {pid}, "
+        f"Modality: {md.get('modality', 'Unknown')}, "
+        f"Body Part: {md.get('body_part', 'Unknown')}"
+        for i, (pid, _, md) in enumerate(chunk)
+    )
+
+    return f"""Analyze these medical images for clinical decision support.{context_str}
+
+Images in order:
+{image_lines}
+
+Clinical Question: {clinical_question}
+
+For EACH image, start a section with the exact line "=== Image <number> ===" and provide:
+1. Key anatomical structures visible
+2. Abnormal findings (masses, hemorrhage, fractures, etc.)
+3. Direct answer to the clinical question
+4. Any critical findings requiring immediate attention"""
+
+
+@tool(args_schema=PatientDICOMBatchAnalysisInput)
+def analyze_patient_dicom_batch(
+    patient_ids: List[str],
+    clinical_question: str = "Analyze each medical image and describe any abnormal findings, masses, hemorrhage, or other clinically significant observations",
+    image_index: int = 0,
+    clinical_context: str = ""
+) -> dict:
+    """
+    Analyze one DICOM image for each of several patients in as few vision calls as possible.
+
+    Use this instead of looping analyze_patient_dicom when screening or
+    comparing a cohort: images load concurrently and Claude sees up to
+    100 of them per request. Larger cohorts are split into request-sized
+    chunks dispatched in parallel.
+
+    Returns per-patient findings aligned with the input order.
+    """
+    try:
+        if not patient_ids:
+            return {"status": "error", "error": "No patient IDs provided"}
+
+        # Load all images concurrently (results aligned with input order)
+        images = load_dicom_images_batch(patient_ids, image_index)
+
+        loaded = []  # (patient_id, image_base64, metadata)
+        failed = []
+        for pid, image_base64 in zip(patient_ids, images):
+            if not image_base64:
+                failed.append(pid)
+                continue
+            loaded.append((pid, image_base64, _cached_metadata(pid, image_index)))
+
+        if not loaded:
+            return {
+                "status": "error",
+                "error": "No DICOM images could be loaded for this batch",
+                "patients_failed": failed
+            }
+
+        # Split into request-sized chunks (the API caps images per request)
+        # and dispatch them concurrently through the staggered dispatcher;
+        # a cohort under the cap still costs exactly one request
+        chunks = [
+            loaded[i:i + _MAX_IMAGES_PER_REQUEST]
+            for i in range(0, len(loaded), _MAX_IMAGES_PER_REQUEST)
+        ]
+        prompts = [
+            _build_batch_prompt(chunk, clinical_question, clinical_context)
+            for chunk in chunks
+        ]
+        images_list = [[img for _, img, _ in chunk] for chunk in chunks]
+
+        responses = call_llm_many(
+            prompts,
+            images_list,
+            model="claude-sonnet-4-5-20250929"
+        )
+
+        results = []
+        for chunk, response in zip(chunks, responses):
+            if response.get("error"):
+                # One failed request marks only its own chunk N/A
+                per_image = [f"N/A (request failed: {response['error']})"] * len(chunk)
+            else:
+                analysis_text = response.get("content", "")
+                per_image = _split_batch_analysis(analysis_text, len(chunk))
+
+            results.extend(
+                {
+                    "patient_id": pid,
+                    "image_index": image_index,
+                    "modality": md.get("modality", "Unknown"),
+                    "body_part": md.get("body_part", "Unknown"),
+                    "vision_analysis": analysis
+                }
+                for (pid, _, md), analysis in zip(chunk, per_image)
+            )
+
+        return {
+            "status": "success",
+            "patients_analyzed": len(loaded),
+            "patients_failed": failed,
+            "clinical_question": clinical_question,
+            "results": results
+        }
+
+    except Exception as e:
+        return {
+            "status": "error",
+            "error": f"Batched DICOM analysis failed: {str(e)}"
+        }
+
+
 @tool(args_schema=DICOMFileAnalysisInput)
 def analyze_dicom_file(
     filename: str,
     clinical_question: str = "Analyze this medical image and describe any abnormal findings",
-    clinical_context: str = ""
+    clinical_context: str = "",
+    max_edge: Optional[int] = None
 ) -> dict:
     """
     Analyze a specific DICOM file by filename.
@@ -178,8 +505,8 @@ def analyze_dicom_file(
     Faster than analyze_patient_dicom when you already know the filename.
     """
     try:
-        # Get metadata
-        metadata = get_dicom_metadata_from_path(filename)
+        # Get metadata (cached across repeat queries for the same file)
+        metadata = _cached_metadata_path(filename)
 
         if metadata.get("error"):
             return {
@@ -189,7 +516,7 @@ def analyze_dicom_file(
             }
 
         # Load image
-        image_base64 = load_dicom_image_by_filename(filename)
+        image_base64 = load_dicom_image_by_filename(filename, max_edge)
 
         if not image_base64:
             return {
@@ -203,15 +530,13 @@ def analyze_dicom_file(
         modality = metadata.get("modality", "Unknown")
         body_part = metadata.get("body_part", "Unknown")
 
-        prompt = f"""Analyze this medical image.
-
-Filename: {filename}
-Modality: {modality}
-Body Part: {body_part}{context_str}
-
-{clinical_question}
-
-Provide specific clinical findings."""
+        prompt = _DICOM_FILE_PROMPT.substitute(
+            filename=filename,
+            modality=modality,
+            body_part=body_part,
+            context_str=context_str,
+            clinical_question=clinical_question,
+        )
 
         response = call_llm(
             prompt=prompt,
@@ -252,13 +577,148 @@ class PatientECGAnalysisInput(BaseModel):
         default="",
         description="Optional clinical context (e.g., 'Patient with hypertension and diabetes')"
     )
+    verbose: bool = Field(
+        default=False,
+        description="Include the raw model analysis text in the result (larger payload)"
+    )
+
+
+def _extract_json_object(text: str) -> Optional[Dict[str, Any]]:
+    """Pull the first JSON object out of an LLM response (tolerates code fences)."""
+    start = text.find("{")
+    end = text.rfind("}")
+    if start == -1 or end <= start:
+        return None
+    payload = text[start:end + 1]
+    try:
+        if _orjson is not None:
+            return _orjson.loads(payload)
+        return json.loads(payload)
+    except ValueError:  # covers both json and orjson decode errors
+        return None
+
+
+def orjson_dumps(obj: Any) -> str:
+    """Serialize a result to JSON text with orjson when available.
+
+    For callers that batch tool results to disk or logs; the LangChain
+    layer controls its own serialization.
+    """
+    if _orjson is not None:
+        return _orjson.dumps(obj).decode()
+    return json.dumps(obj)
+
+
+def _analyze_ecg_fused(
+    patient_id: str,
+    clinical_question: str,
+    clinical_context: str
+) -> Optional[Dict[str, Any]]:
+    """
+    Answer a custom ECG question AND extract structured rhythm findings
+    in a single vision call.
+
+    The previous flow ran analyze_ecg_for_rhythm and then a second
+    call_llm with the same image for the custom question - two vision
+    inferences per query. One fused prompt halves latency and token cost.
+
+    Returns a result dict shaped like analyze_ecg_for_rhythm's (plus
+    'custom_analysis'), or None when the patient has no ECG image.
+    """
+    ecg_image = load_ecg_image(patient_id)
+    if not ecg_image:
+        return None
+
+    context_str = f" (Clinical context: {clinical_context})" if clinical_context else ""
+    prompt = f"""Analyze this ECG tracing for patient {patient_id}{context_str}.
+
+Return a single JSON object with these keys:
+- "rhythm": the cardiac rhythm classification
+- "afib_detected": true or false
+- "rr_intervals": regularity of R-R intervals
+- "p_waves": P wave morphology and presence
+- "baseline": baseline appearance
+- "confidence": your confidence in the rhythm assessment
+- "clinical_significance": clinical significance of the findings
+- "custom_analysis": detailed answer to this question: {clinical_question}
+
+Respond with ONLY the JSON object."""
+
+    response = call_llm(
+        prompt=prompt,
+        images=[ecg_image],
+        model="claude-sonnet-4-5-20250929"
+    )
+    raw_text = response["content"] if isinstance(response, dict) else str(response)
+
+    data = _extract_json_object(raw_text)
+    if data is None:
+        # Unparseable response - surface the raw text as the custom answer
+        data = {"custom_analysis": raw_text}
+
+    afib = data.get("afib_detected", False)
+    if isinstance(afib, str):
+        afib = afib.strip().lower() in ("true", "yes")
+
+    return {
+        "patient_id": patient_id,
+        "ecg_available": True,
+        "rhythm": data.get("rhythm", "Unknown"),
+        "afib_detected": bool(afib),
+        "rr_intervals": data.get("rr_intervals", "Unknown"),
+        "p_waves": data.get("p_waves", "Unknown"),
+        "baseline": data.get("baseline", "Unknown"),
+        "confidence": data.get("confidence", "Unknown"),
+        "clinical_significance": data.get("clinical_significance", ""),
+        "custom_analysis": data.get("custom_analysis", ""),
+        "raw_analysis": raw_text
+    }
+
+
+def _analyze_ecg_direct(
+    patient_id: str,
+    clinical_question: str,
+    clinical_context: str
+) -> Optional[Dict[str, Any]]:
+    """
+    Answer a custom ECG question with one question-only vision call.
+
+    Skips the structured rhythm workup entirely: for questions that are
+    clearly not about rhythm, requesting the rhythm JSON just spends
+    output tokens nobody reads.
+    """
+    ecg_image = load_ecg_image(patient_id)
+    if not ecg_image:
+        return None
+
+    context_str = f" (Clinical context: {clinical_context})" if clinical_context else ""
+    prompt = f"""Analyze this ECG tracing for patient {patient_id}{context_str}.
+
+{clinical_question}
+
+Provide a detailed analysis with specific findings."""
+
+    response = call_llm(
+        prompt=prompt,
+        images=[ecg_image],
+        model="claude-sonnet-4-5-20250929"
+    )
+    text = response["content"] if isinstance(response, dict) else str(response)
+
+    return {
+        "patient_id": patient_id,
+        "ecg_available": True,
+        "custom_analysis": text,
+        "raw_analysis": text
+    }
 
 
 @tool(args_schema=PatientECGAnalysisInput)
 def analyze_patient_ecg(
     patient_id: str,
     clinical_question: str = "Analyze the ECG tracing and describe the cardiac rhythm including rate, regularity, P waves, QRS complexes, and any abnormalities",
-    clinical_context: str = ""
+    clinical_context: str = "",
+    verbose: bool = False
 ) -> dict:
     """
     Analyze a patient's ECG image using the LLM's vision API.
@@ -272,50 +732,58 @@ def analyze_patient_ecg(
     Returns structured analysis including rhythm classification, findings, and clinical significance.
     """
     try:
-        # Use the structured ECG analysis primitive
-        result = analyze_ecg_for_rhythm(patient_id, clinical_context)
+        question_lower = clinical_question.lower()
+        is_rhythm_question = (
+            "atrial fibrillation" in question_lower or "rhythm" in question_lower
+        )
 
-        if not result.get("ecg_available", False):
+        if is_rhythm_question:
+            # Use the structured ECG analysis primitive
+            result = analyze_ecg_for_rhythm(patient_id, clinical_context)
+        elif verbose:
+            # Custom question with full detail requested: one fused call
+            # returns both the structured rhythm findings and the custom
+            # answer, instead of two vision calls on the same image
+            result = _analyze_ecg_fused(patient_id, clinical_question, clinical_context)
+        else:
+            # Custom question, lean payload: skip the rhythm workup and
+            # ask only the question - still a single vision call, but no
+            # structured-JSON output tokens nobody reads
+            result = _analyze_ecg_direct(patient_id, clinical_question, clinical_context)
+
+        if not result or not result.get("ecg_available", False):
             return {
                 "status": "error",
                 "patient_id": patient_id,
                 "error": "No ECG image available for this patient"
             }
 
-        # If custom question, do additional analysis
-        if "atrial fibrillation" not in clinical_question.lower() and "rhythm" not in clinical_question.lower():
-            # Load image for custom analysis
-            ecg_image = load_ecg_image(patient_id)
-            if ecg_image:
-                context_str = f" (Clinical context: {clinical_context})" if clinical_context else ""
-                prompt = f"""Analyze this ECG tracing for patient {patient_id}{context_str}.
-
-{clinical_question}
-
-Provide a detailed analysis with specific findings."""
-
-                response = call_llm(
-                    prompt=prompt,
-                    images=[ecg_image],
-                    model="claude-sonnet-4-5-20250929"  # Use Claude Sonnet 4.5 for vision
-                )
-                custom_analysis = response["content"] if isinstance(response, dict) else str(response)
-                result["custom_analysis"] = custom_analysis
-
-        return {
+        # The raw analysis text duplicates the structured fields and is the
+        # bulk of the payload; include it only on request
+        response = {
             "status": "success",
             "patient_id": patient_id,
             "ecg_available": True,
-            "rhythm": result.get("rhythm", "Unknown"),
-            "afib_detected": result.get("afib_detected", False),
-            "rr_intervals": result.get("rr_intervals", "Unknown"),
-            "p_waves": result.get("p_waves", "Unknown"),
-            "baseline": result.get("baseline", "Unknown"),
-            "confidence": result.get("confidence", "Unknown"),
-            "clinical_significance": result.get("clinical_significance", ""),
-            "clinical_context": clinical_context,
-            "detailed_analysis": result.get("raw_analysis", "")
+            "custom_analysis": result.get("custom_analysis", "")
         }
+        # The direct path carries no rhythm findings - omit the fields
+        # rather than filling them with placeholders
+        if "rhythm" in result:
+            response.update({
+                "rhythm": result.get("rhythm", "Unknown"),
+                "afib_detected": result.get("afib_detected", False),
+                "rr_intervals": result.get("rr_intervals", "Unknown"),
+                "p_waves": result.get("p_waves", "Unknown"),
+                "baseline": result.get("baseline", "Unknown"),
+                "confidence": result.get("confidence", "Unknown"),
+                "clinical_significance": result.get("clinical_significance", "")
+            })
+        if verbose:
+            response.update({
+                "clinical_context": clinical_context,
+                "detailed_analysis": result.get("raw_analysis", "")
+            })
+        return response
 
     except Exception as e:
         return {
@@ -325,6 +793,46 @@ Provide a detailed analysis with specific findings."""
         }
 
 
+# Small background pool for fire-and-forget image prefetch; loads land in
+# the byte-bounded PNG cache so the later analysis call finds them warm
+_prefetch_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="dicom-prefetch")
+_PREFETCH_MAX_IMAGES = 25
+
+
+class PrefetchPatientImagesInput(BaseModel):
+    """Input schema for patient image prefetch."""
+
+    patient_id: str = Field(
+        description="Patient UUID whose DICOM images should be warmed in the cache"
+    )
+
+
+@tool(args_schema=PrefetchPatientImagesInput)
+def prefetch_patient_images(patient_id: str) -> dict:
+    """
+    Start loading a patient's DICOM images into the image cache in the background.
+
+    Call this when a patient chart is opened: by the time the first
+    analyze_patient_dicom question arrives, the converted PNG is usually
+    already warm in the cache. Returns immediately without waiting for
+    the loads; at most 25 images are prefetched per call so a large
+    series cannot flood the cache.
+    """
+    try:
+        info = _cached_find(patient_id)
+        if info.get("error"):
+            return {"status": "error", "patient_id": patient_id, "error": info["error"]}
+
+        count = min(info.get("dicom_count", 0), _PREFETCH_MAX_IMAGES)
+        for i in range(count):
+            _prefetch_executor.submit(load_dicom_image, patient_id, i)
+
+        return {"status": "prefetching", "patient_id": patient_id, "count": count}
+
+    except Exception as e:
+        return {"status": "error", "patient_id": patient_id, "error": str(e)}
+
+
 class VisionAnalysisInput(BaseModel):
     """Input schema for vision analysis."""
 
@@ -332,7 +840,7 @@ class VisionAnalysisInput(BaseModel):
         description="Specific clinical question to answer about the images (e.g., 'Does this ECG show atrial fibrillation pattern?', 'Identify any masses or hemorrhage in this brain MRI')"
     )
     image_data: List[Dict[str, Any]] = Field(
-        description="List of image objects, each containing 'image_base64' (required), 'patient_id' (optional), 'modality' (optional), 'context' (optional)"
+        description="List of image objects, each containing 'image_base64' or 'image_url' (one required), 'patient_id' (optional), 'modality' (optional), 'context' (optional)"
     )
     max_images: int = Field(
         default=3,
@@ -353,7 +861,9 @@ def analyze_medical_images(
     and need to analyze them for clinical findings.
 
     The tool accepts a list of image objects with:
-    - image_base64 (required): Base64-encoded PNG image string
+    - image_base64: Base64-encoded PNG image string
+    - image_url: URL of a hosted image (e.g. signed GCS URL) - one of
+      image_base64 / image_url is required; URL mode skips the base64 payload
     - patient_id (optional): Patient identifier
     - modality (optional): Imaging modality (MRI, CT, ECG, etc.)
     - context (optional): Clinical context for the image
@@ -368,40 +878,45 @@ def analyze_medical_images(
         # Limit images for token efficiency
         images_to_analyze = image_data[:max_images]
 
-        # Extract base64 images
-        base64_images = []
-        patient_context = []
-
-        for idx, img in enumerate(images_to_analyze):
-            if "image_base64" not in img:
-                continue
-
-            base64_images.append(img["image_base64"])
-
-            # Build context for each image
-            context_parts = [f"Image {idx + 1}"]
-            if "patient_id" in img:
-                context_parts.append(f"Patient: {img['patient_id']}")
-            if "modality" in img:
-                context_parts.append(f"Modality: {img['modality']}")
-            if "context" in img:
-                context_parts.append(img["context"])
-
-            patient_context.append(" | ".join(context_parts))
-
-        if not base64_images:
+        # URL-referenced images are emitted before base64 payloads in the
+        # request, so order the context the same way
+        url_items = [img for img in images_to_analyze if "image_url" in img]
+        b64_items = [
+            img for img in images_to_analyze
+            if "image_base64" in img and "image_url" not in img
+        ]
+
+        ordered_items = url_items + b64_items
+        image_urls = [img["image_url"] for img in url_items]
+        base64_images = [img["image_base64"] for img in b64_items]
+
+        # Single-pass context assembly: empty parts drop out of the join
+        patient_context = [
+            " | ".join(
+                part for part in (
+                    f"Image {idx + 1}",
+                    f"Patient: {img['patient_id']}" if "patient_id" in img else None,
+                    f"Modality: {img['modality']}" if "modality" in img else None,
+                    img.get("context"),
+                ) if part
+            )
+            for idx, img in enumerate(ordered_items)
+        ]
+
+        if not base64_images and not image_urls:
             return {
                 "status": "error",
-                "error": "No valid images found in image_data (missing 'image_base64' key)"
+                "error": "No valid images found in image_data (missing 'image_base64' or 'image_url' key)"
             }
 
         # Build prompt with context
+        context_block = "\n".join(f"- {ctx}" for ctx in patient_context)
         full_prompt = f"""You are analyzing medical images for clinical decision support.
 
 {analysis_prompt}
 
 Context for each image:
-{chr(10).join(f"- {ctx}" for ctx in patient_context)}
+{context_block}
 
 For each image, provide:
 1. Patient ID (if provided)
@@ -414,7 +929,8 @@ Format your response as structured findings for each image."""
         # Call LLM vision API with Claude Sonnet 4.5
         response = call_llm(
             prompt=full_prompt,
-            images=base64_images,
+            images=base64_images or None,
+            image_urls=image_urls or None,
             model="claude-sonnet-4-5-20250929"
         )
 
@@ -423,7 +939,7 @@ Format your response as structured findings for each image."""
 
         return {
             "status": "success",
-            "images_analyzed": len(base64_images),
+            "images_analyzed": len(base64_images) + len(image_urls),
             "clinical_question": analysis_prompt,
             "vision_analysis": analysis_text,
             "patient_contexts": patient_context
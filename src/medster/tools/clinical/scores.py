@@ -1,7 +1,14 @@
 from langchain.tools import tool
 from typing import Literal, Optional
 from pydantic import BaseModel, Field
-from datetime import datetime
+from datetime import date
+from functools import lru_cache
+from types import MappingProxyType
+import math
+import re
+import sys
+
+import numpy as np
 
 ####################################
 # Input Schemas
@@ -29,7 +36,7 @@ class PatientClinicalScoreInput(BaseModel):
 # CHA2DS2-VASc component SNOMED codes
 CHADSVASC_SNOMED_CODES = {
     # C - Congestive Heart Failure
-    "chf": [
+    "chf": frozenset([
         "42343007",    # Congestive heart failure
         "88805009",    # Chronic congestive heart failure
         "84114007",    # Heart failure
@@ -40,9 +47,9 @@ CHADSVASC_SNOMED_CODES = {
         "443253003",   # Chronic systolic heart failure
         "443254009",   # Chronic diastolic heart failure
         "698594003",   # Symptomatic congestive heart failure
-    ],
+    ]),
     # H - Hypertension
-    "hypertension": [
+    "hypertension": frozenset([
         "38341003",    # Hypertensive disorder
         "59621000",    # Essential hypertension
         "31992008",    # Secondary hypertension
@@ -53,9 +60,9 @@ CHADSVASC_SNOMED_CODES = {
         "56218007",    # Systolic hypertension
         "194767001",   # Benign hypertensive heart disease
         "194779001",   # Hypertensive heart and renal disease
-    ],
+    ]),
     # D - Diabetes Mellitus
-    "diabetes": [
+    "diabetes": frozenset([
         "44054006",    # Diabetes mellitus type 2
         "46635009",    # Diabetes mellitus type 1
         "73211009",    # Diabetes mellitus
@@ -65,9 +72,9 @@ CHADSVASC_SNOMED_CODES = {
         "422014003",   # Diabetic on insulin
         "190330002",   # Type 2 diabetes mellitus with hypoglycemia
         "314771006",   # Type 2 diabetes mellitus with hypoglycaemic coma
-    ],
+    ]),
     # S2 - Stroke/TIA/Thromboembolism
-    "stroke_tia": [
+    "stroke_tia": frozenset([
         "230690007",   # Stroke / Cerebrovascular accident
         "266257000",   # Transient ischemic attack
         "195206000",   # Ischemic stroke
@@ -80,9 +87,9 @@ CHADSVASC_SNOMED_CODES = {
         "266253001",   # Transient cerebral ischemia
         "75543006",    # Cerebral embolism
         "723857007",   # Silent micro-hemorrhage of brain
-    ],
+    ]),
     # V - Vascular Disease (MI, PAD, Aortic Plaque)
-    "vascular_disease": [
+    "vascular_disease": frozenset([
         "22298006",    # Myocardial infarction
         "399211009",   # History of myocardial infarction
         "57054005",    # Acute myocardial infarction
@@ -97,25 +104,88 @@ CHADSVASC_SNOMED_CODES = {
         "128053003",   # Deep venous thrombosis
         "414545008",   # Ischemic heart disease
         "49436004",    # NOT AFib itself - but could indicate vascular burden
-    ],
+    ]),
 }
 
 
+# Reverse index built once at import: SNOMED code -> score component.
+# Matching then iterates the patient's codes with O(1) lookups instead of
+# scanning every component's code list per patient. Keys are interned so
+# lookups against interned patient codes short-circuit on pointer
+# equality instead of comparing digits.
+CODE_TO_COMPONENT = {
+    sys.intern(code): component
+    for component, codes in CHADSVASC_SNOMED_CODES.items()
+    for code in codes
+}
+
+
+# Multi-pattern matcher for finding SNOMED codes embedded in free text
+# (display strings, note excerpts). Exact-match callers keep the
+# O(1)-per-code reverse dict above; this path is for substring scans,
+# where a naive sweep would be O(codes x text). pyahocorasick is not a
+# declared dependency, so an Aho-Corasick automaton is built only when
+# the library is installed; otherwise a single compiled alternation
+# regex scans the text in one pass.
+try:
+    import ahocorasick as _ahocorasick
+except ImportError:
+    _ahocorasick = None
+
+if _ahocorasick is not None:
+    _SNOMED_AUTOMATON = _ahocorasick.Automaton()
+    for _code, _component in CODE_TO_COMPONENT.items():
+        _SNOMED_AUTOMATON.add_word(_code, (_component, _code))
+    _SNOMED_AUTOMATON.make_automaton()
+    _SNOMED_CODE_RE = None
+else:
+    _SNOMED_AUTOMATON = None
+    _SNOMED_CODE_RE = re.compile(
+        "|".join(sorted(CODE_TO_COMPONENT, key=len, reverse=True))
+    )
+
+
+def find_chadsvasc_components_in_text(text: str) -> set:
+    """Return the CHA2DS2-VASc components whose SNOMED codes occur in text."""
+    if not text:
+        return set()
+    if _SNOMED_AUTOMATON is not None:
+        return {component for _, (component, _code) in _SNOMED_AUTOMATON.iter(text)}
+    return {
+        CODE_TO_COMPONENT[match.group()]
+        for match in _SNOMED_CODE_RE.finditer(text)
+    }
+
+
+@lru_cache(maxsize=4096)
+def _age_on_day(birth_date_str: str, today_ordinal: int) -> int:
+    """Age for a YYYY-MM-DD birth date on a given day (proleptic ordinal)."""
+    # FHIR birthDate is zero-padded ISO 8601, so fixed slices avoid the
+    # strptime format-parsing overhead on every call.
+    year = int(birth_date_str[0:4])
+    month = int(birth_date_str[5:7])
+    day = int(birth_date_str[8:10])
+    today = date.fromordinal(today_ordinal)
+    return today.year - year - ((today.month, today.day) < (month, day))
+
+
 def calculate_age(birth_date_str: str) -> int:
     """Calculate age from birth date string (YYYY-MM-DD format)."""
     try:
-        birth_date = datetime.strptime(birth_date_str, "%Y-%m-%d")
-        today = datetime.now()
-        age = today.year - birth_date.year
-        if (today.month, today.day) < (birth_date.month, birth_date.day):
-            age -= 1
-        return age
+        return _age_on_day(birth_date_str, date.today().toordinal())
     except Exception:
         return 0
 
 
-def extract_chadsvasc_params(demographics: dict, conditions: list) -> dict:
-    """Extract CHA2DS2-VASc parameters from patient demographics and conditions."""
+def extract_chadsvasc_params(
+    demographics: dict, conditions: list, patient_codes: Optional[set] = None
+) -> dict:
+    """Extract CHA2DS2-VASc parameters from patient demographics and conditions.
+
+    Callers that already hold the patient's condition code set (via
+    extract_condition_codes) can pass it as patient_codes and skip the
+    per-condition dict walk entirely.
+    """
     params = {
         "chf": False,
         "hypertension": False,
@@ -140,70 +210,116 @@ def extract_chadsvasc_params(demographics: dict, conditions: list) -> dict:
     gender = demographics.get("gender", "").lower()
     params["female"] = gender == "female"
 
-    # Collect all SNOMED codes from conditions
-    patient_codes = set()
-    for condition in conditions:
-        code = str(condition.get("code", ""))
-        if code:
-            patient_codes.add(code)
+    # Collect all SNOMED codes from conditions unless already provided
+    if patient_codes is None:
+        patient_codes = set()
+        for condition in conditions:
+            code = str(condition.get("code", ""))
+            if code:
+                patient_codes.add(sys.intern(code))
 
-    # Match against CHA2DS2-VASc SNOMED codes
-    for component, snomed_codes in CHADSVASC_SNOMED_CODES.items():
-        for code in snomed_codes:
-            if code in patient_codes:
-                params[component] = True
-                break
+    # Match against CHA2DS2-VASc SNOMED codes via the reverse index
+    for code in patient_codes:
+        component = CODE_TO_COMPONENT.get(code)
+        if component:
+            params[component] = True
 
     return params
 
 
-####################################
-# Score Calculation Functions
-####################################
-
-def calculate_wells_dvt(params: dict) -> dict:
-    """Calculate Wells' Criteria for DVT probability."""
-    score = 0
-
-    # Active cancer
-    if params.get("active_cancer", False):
-        score += 1
+def score_chadsvasc_from_codes(
+    codes: set,
+    age: int,
+    female: bool,
+    # Component sets bound as defaults: resolved once at definition
+    # time, so the hot path runs set intersections against locals with
+    # no dict or global lookups per call.
+    _chf=CHADSVASC_SNOMED_CODES["chf"],
+    _htn=CHADSVASC_SNOMED_CODES["hypertension"],
+    _dm=CHADSVASC_SNOMED_CODES["diabetes"],
+    _stroke=CHADSVASC_SNOMED_CODES["stroke_tia"],
+    _vasc=CHADSVASC_SNOMED_CODES["vascular_disease"],
+) -> int:
+    """Specialized CHA2DS2-VASc total straight from a condition code set.
+
+    Skips the params-dict round trip of extract_chadsvasc_params +
+    calculate_chadsvasc for callers that only need the number (cohort
+    screening over extract_condition_codes output).
+    """
+    return (
+        int(bool(codes & _chf))
+        + int(bool(codes & _htn))
+        + (2 if age >= 75 else int(age >= 65))
+        + int(bool(codes & _dm))
+        + 2 * int(bool(codes & _stroke))
+        + int(bool(codes & _vasc))
+        + int(bool(female))
+    )
 
-    # Paralysis, paresis, or recent plaster immobilization
-    if params.get("paralysis_or_immobilization", False):
-        score += 1
 
-    # Recently bedridden >3 days or major surgery within 12 weeks
-    if params.get("bedridden_or_surgery", False):
-        score += 1
+####################################
+# Batch (Cohort) Scoring
+####################################
 
-    # Localized tenderness along deep venous system
-    if params.get("localized_tenderness", False):
-        score += 1
+# Feature column order for batch scoring, with the matching point weights
+_CHADSVASC_FEATURE_ORDER = (
+    "chf", "hypertension", "age_75_or_older", "age_65_to_74",
+    "diabetes", "stroke_tia", "vascular_disease", "female",
+)
+_CHADSVASC_WEIGHTS = np.array([1, 1, 2, 1, 1, 2, 1, 1], dtype=np.int64)
 
-    # Entire leg swelling
-    if params.get("leg_swelling", False):
-        score += 1
 
-    # Calf swelling >3cm compared to asymptomatic leg
-    if params.get("calf_swelling_3cm", False):
-        score += 1
+def extract_chadsvasc_params_batch(params_list: list) -> "np.ndarray":
+    """Stack per-patient CHA2DS2-VASc parameter dicts into a feature matrix.
 
-    # Pitting edema
-    if params.get("pitting_edema", False):
-        score += 1
+    Returns an (n, 8) boolean array with columns in
+    _CHADSVASC_FEATURE_ORDER, ready for calculate_chadsvasc_batch.
+    """
+    feats = np.empty((len(params_list), len(_CHADSVASC_FEATURE_ORDER)), dtype=bool)
+    for i, params in enumerate(params_list):
+        get = params.get
+        for j, key in enumerate(_CHADSVASC_FEATURE_ORDER):
+            feats[i, j] = bool(get(key, False))
+    return feats
+
+
+def calculate_chadsvasc_batch(features: "np.ndarray") -> "np.ndarray":
+    """Vectorized CHA2DS2-VASc totals for a cohort.
+
+    One matrix-vector product scores the whole cohort instead of a
+    per-patient Python loop. features is an (n, 8) boolean/int array
+    with columns in _CHADSVASC_FEATURE_ORDER; returns an (n,) int array
+    of scores matching calculate_chadsvasc, including the age tier where
+    >=75 takes precedence over 65-74.
+    """
+    feats = np.asarray(features).astype(np.int64, copy=True)
+    # Age >=75 (column 2) supersedes 65-74 (column 3)
+    feats[:, 3] &= 1 - feats[:, 2]
+    return feats @ _CHADSVASC_WEIGHTS
 
-    # Collateral superficial veins
-    if params.get("collateral_veins", False):
-        score += 1
 
-    # Previously documented DVT
-    if params.get("previous_dvt", False):
-        score += 1
+####################################
+# Score Calculation Functions
+####################################
 
-    # Alternative diagnosis at least as likely as DVT
-    if params.get("alternative_diagnosis", False):
-        score -= 2
+def calculate_wells_dvt(params: dict) -> dict:
+    """Calculate Wells' Criteria for DVT probability."""
+    get = params.get
+    # Each criterion contributes +1; an alternative diagnosis at least as
+    # likely as DVT subtracts 2. Summing bool-as-int terms keeps the
+    # accumulation branch-free.
+    score = (
+        int(bool(get("active_cancer", False)))
+        + int(bool(get("paralysis_or_immobilization", False)))
+        + int(bool(get("bedridden_or_surgery", False)))
+        + int(bool(get("localized_tenderness", False)))
+        + int(bool(get("leg_swelling", False)))
+        + int(bool(get("calf_swelling_3cm", False)))
+        + int(bool(get("pitting_edema", False)))
+        + int(bool(get("collateral_veins", False)))
+        + int(bool(get("previous_dvt", False)))
+        - 2 * int(bool(get("alternative_diagnosis", False)))
+    )
 
     # Interpretation
     if score <= 0:
@@ -227,37 +343,20 @@ def calculate_wells_dvt(params: dict) -> dict:
 
 def calculate_chadsvasc(params: dict) -> dict:
     """Calculate CHA2DS2-VASc Score for Atrial Fibrillation Stroke Risk."""
-    score = 0
-
-    # C - Congestive heart failure
-    if params.get("chf", False):
-        score += 1
-
-    # H - Hypertension
-    if params.get("hypertension", False):
-        score += 1
-
-    # A2 - Age >= 75
-    if params.get("age_75_or_older", False):
-        score += 2
-    elif params.get("age_65_to_74", False):
-        score += 1
-
-    # D - Diabetes mellitus
-    if params.get("diabetes", False):
-        score += 1
-
-    # S2 - Stroke/TIA/thromboembolism
-    if params.get("stroke_tia", False):
-        score += 2
-
-    # V - Vascular disease
-    if params.get("vascular_disease", False):
-        score += 1
-
-    # Sc - Sex category (female)
-    if params.get("female", False):
-        score += 1
+    get = params.get
+    age_75 = bool(get("age_75_or_older", False))
+    # C(1) H(1) A2(2, or 1 for 65-74) D(1) S2(2) V(1) Sc(1), summed as
+    # bool-as-int terms so the accumulation is branch-free.
+    score = (
+        int(bool(get("chf", False)))
+        + int(bool(get("hypertension", False)))
+        + 2 * int(age_75)
+        + int(not age_75 and bool(get("age_65_to_74", False)))
+        + int(bool(get("diabetes", False)))
+        + 2 * int(bool(get("stroke_tia", False)))
+        + int(bool(get("vascular_disease", False)))
+        + int(bool(get("female", False)))
+    )
 
     # Risk interpretation
     if score == 0:
@@ -280,27 +379,16 @@ def calculate_chadsvasc(params: dict) -> dict:
 
 def calculate_curb65(params: dict) -> dict:
     """Calculate CURB-65 Score for Pneumonia Severity."""
-    score = 0
-
-    # C - Confusion (new)
-    if params.get("confusion", False):
-        score += 1
-
-    # U - Urea > 7 mmol/L (BUN > 19 mg/dL)
-    if params.get("urea_elevated", False):
-        score += 1
-
-    # R - Respiratory rate >= 30
-    if params.get("respiratory_rate_30", False):
-        score += 1
-
-    # B - Blood pressure (SBP < 90 or DBP <= 60)
-    if params.get("low_blood_pressure", False):
-        score += 1
-
-    # 65 - Age >= 65
-    if params.get("age_65_or_older", False):
-        score += 1
+    get = params.get
+    # Confusion, Urea >7 mmol/L, RR >=30, low BP, age >=65 - one point
+    # each, summed as bool-as-int terms.
+    score = (
+        int(bool(get("confusion", False)))
+        + int(bool(get("urea_elevated", False)))
+        + int(bool(get("respiratory_rate_30", False)))
+        + int(bool(get("low_blood_pressure", False)))
+        + int(bool(get("age_65_or_older", False)))
+    )
 
     # Risk interpretation
     if score <= 1:
@@ -325,10 +413,28 @@ def calculate_curb65(params: dict) -> dict:
     }
 
 
+def _meld_kernel(creatinine: float, bilirubin: float, inr: float) -> float:
+    """Raw MELD formula over pre-clamped lab values."""
+    return (
+        0.957 * math.log(creatinine) +
+        0.378 * math.log(bilirubin) +
+        1.120 * math.log(inr) +
+        0.643
+    ) * 10
+
+
+# numba is not a declared dependency; JIT-compile the kernel when it
+# happens to be installed, otherwise keep the pure-Python version.
+try:
+    from numba import njit as _njit
+
+    _meld_kernel = _njit(cache=True, fastmath=True)(_meld_kernel)
+except ImportError:
+    pass
+
+
 def calculate_meld(params: dict) -> dict:
     """Calculate MELD Score for End-Stage Liver Disease."""
-    import math
-
     # Get values with defaults
     creatinine = max(1.0, min(4.0, params.get("creatinine", 1.0)))
     bilirubin = max(1.0, params.get("bilirubin", 1.0))
@@ -339,15 +445,7 @@ def calculate_meld(params: dict) -> dict:
     if dialysis:
         creatinine = 4.0
 
-    # MELD formula
-    meld_score = (
-        0.957 * math.log(creatinine) +
-        0.378 * math.log(bilirubin) +
-        1.120 * math.log(inr) +
-        0.643
-    ) * 10
-
-    meld_score = round(meld_score)
+    meld_score = round(_meld_kernel(creatinine, bilirubin, inr))
     meld_score = max(6, min(40, meld_score))
 
     # Mortality interpretation
@@ -374,6 +472,18 @@ def calculate_meld(params: dict) -> dict:
 # Main Tool
 ####################################
 
+# Dispatch table built once at import; MappingProxyType keeps it
+# read-only so callers can't mutate the registry at runtime.
+_CALCULATORS = MappingProxyType({
+    "wells_dvt": calculate_wells_dvt,
+    "chadsvasc": calculate_chadsvasc,
+    "curb65": calculate_curb65,
+    "meld": calculate_meld,
+})
+
+_DISCLAIMER = "Clinical scores are decision support tools. Always use clinical judgment."
+
+
 @tool(args_schema=ClinicalScoreInput)
 def calculate_clinical_score(
     score_type: str,
@@ -384,22 +494,16 @@ def calculate_clinical_score(
     CURB-65, MELD, and others. Provides risk stratification and recommendations.
     IMPORTANT: These are decision support tools - always use clinical judgment.
     """
-    calculators = {
-        "wells_dvt": calculate_wells_dvt,
-        "chadsvasc": calculate_chadsvasc,
-        "curb65": calculate_curb65,
-        "meld": calculate_meld,
-    }
-
-    if score_type not in calculators:
+    calculator = _CALCULATORS.get(score_type)
+    if calculator is None:
         return {
             "error": f"Score type '{score_type}' not implemented",
-            "available_scores": list(calculators.keys())
+            "available_scores": list(_CALCULATORS)
         }
 
     try:
-        result = calculators[score_type](parameters)
-        result["disclaimer"] = "Clinical scores are decision support tools. Always use clinical judgment."
+        result = calculator(parameters)
+        result["disclaimer"] = _DISCLAIMER
         return result
     except Exception as e:
         return {
@@ -427,11 +531,28 @@ def calculate_patient_score(
     Use this instead of calculate_clinical_score when you have a patient_id and want
     automatic risk factor extraction from their medical record.
     """
-    from medster.tools.medical.api import get_fhir_resource, search_fhir, extract_conditions
+    from medster.tools.medical.api import (
+        load_patient_bundle,
+        index_bundle,
+        extract_condition_codes,
+    )
 
     try:
-        # Fetch patient demographics
-        patient = get_fhir_resource("Patient", patient_id)
+        # Load the bundle once and pull demographics and conditions from
+        # its resource index, instead of re-loading it per resource type
+        # through get_fhir_resource and search_fhir.
+        bundle = load_patient_bundle(patient_id)
+        if not bundle:
+            return {
+                "patient_id": patient_id,
+                "score_type": score_type,
+                "error": f"Patient {patient_id} not found in Coherent Data Set",
+            }
+
+        index = index_bundle(bundle)
+        patients = index.get("Patient", [])
+        patient = patients[0] if patients else {}
+        condition_count = len(index.get("Condition", []))
 
         demographics = {
             "patient_id": patient_id,
@@ -447,14 +568,13 @@ def calculate_patient_score(
             family = name_entry.get("family", "")
             name = f"{given} {family}".strip()
 
-        # Fetch patient conditions
-        bundle = search_fhir("Condition", patient=patient_id, _count=500)
-        conditions = extract_conditions(bundle)
-
         # Calculate based on score type
         if score_type == "chadsvasc":
-            # Extract CHA2DS2-VASc parameters from patient data
-            params = extract_chadsvasc_params(demographics, conditions)
+            # Extract CHA2DS2-VASc parameters straight from the bundle's
+            # condition code set - full condition dicts are never needed
+            params = extract_chadsvasc_params(
+                demographics, [], patient_codes=extract_condition_codes(bundle)
+            )
 
             # Calculate score
             score_result = calculate_chadsvasc(params)
@@ -492,8 +612,8 @@ def calculate_patient_score(
                 "recommendation": score_result["recommendation"],
                 "components_present": components_found,
                 "extracted_parameters": params,
-                "conditions_analyzed": len(conditions),
-                "disclaimer": "Clinical scores are decision support tools. Always use clinical judgment."
+                "conditions_analyzed": condition_count,
+                "disclaimer": _DISCLAIMER,
             }
         else:
             return {
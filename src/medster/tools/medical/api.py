@@ -1,8 +1,7 @@
+import heapq
 import os
-import json
-import glob
+import sys
 from typing import Optional, List
-from pathlib import Path
 
 # Import GCS storage module for cloud-aware data access
 from medster.utils.gcs_storage import (
@@ -10,8 +9,17 @@ from medster.utils.gcs_storage import (
     list_patients as gcs_list_patients,
     load_csv_file,
     get_storage_info,
+    clear_patient_cache,
+    open_fhir_file,
 )
 
+# ijson enables incremental bundle decoding without materializing the
+# whole document; it is optional, not a declared dependency
+try:
+    import ijson as _ijson
+except ImportError:
+    _ijson = None
+
 ####################################
 # Coherent Data Set Configuration
 ####################################
@@ -51,6 +59,63 @@ def list_available_patients(limit: Optional[int] = None) -> List[str]:
     return gcs_list_patients(limit)
 
 
+def index_bundle(bundle: dict) -> dict:
+    """
+    Index a bundle's resources by resourceType in one pass.
+
+    The index is memoized on the bundle under the non-FHIR key "_index",
+    so repeated searches against a cached bundle skip re-walking its
+    thousands of entries. Bundles are treated as read-only after load,
+    which keeps the memo valid.
+
+    Args:
+        bundle: FHIR Bundle dict
+
+    Returns:
+        dict mapping resourceType -> list of resource dicts
+    """
+    index = bundle.get("_index")
+    if index is None:
+        index = {}
+        for entry in bundle.get("entry", []):
+            resource = entry.get("resource", {})
+            index.setdefault(resource.get("resourceType", ""), []).append(resource)
+        bundle["_index"] = index
+    return index
+
+
+def stream_patient_resources(patient_id: str, resource_type: str):
+    """
+    Yield a patient's resources of one type without holding the bundle.
+
+    With ijson installed, entries are decoded incrementally off the raw
+    byte stream and only matching resources are materialized, so peak
+    memory stays near one resource even for tens-of-MB bundles. Without
+    it, this falls back to the cached full load plus the bundle index -
+    same results, full-document memory profile.
+
+    Args:
+        patient_id: The patient's unique identifier
+        resource_type: FHIR resource type to yield (e.g. "Condition")
+
+    Yields:
+        Resource dicts of the requested type
+    """
+    if _ijson is not None:
+        fileobj = open_fhir_file(patient_id)
+        if fileobj is not None:
+            with fileobj:
+                for entry in _ijson.items(fileobj, "entry.item"):
+                    resource = entry.get("resource", {})
+                    if resource.get("resourceType") == resource_type:
+                        yield resource
+            return
+
+    bundle = load_patient_bundle(patient_id)
+    if bundle:
+        yield from index_bundle(bundle).get(resource_type, [])
+
+
 def search_fhir(resource_type: str, **search_params) -> dict:
     """
     Search for FHIR resources in a patient's bundle.
@@ -76,25 +141,28 @@ def search_fhir(resource_type: str, **search_params) -> dict:
             "error": f"Patient {patient_id} not found in Coherent Data Set"
         }
 
-    # Filter resources by type
-    matching_entries = []
-    for entry in bundle.get("entry", []):
-        resource = entry.get("resource", {})
-        if resource.get("resourceType") == resource_type:
-            # Apply additional filters
-            if _matches_search_params(resource, search_params):
-                matching_entries.append(entry)
-
-    # Apply limit
+    resources = index_bundle(bundle).get(resource_type, [])
     limit = search_params.get("_count", 100)
-    matching_entries = matching_entries[:limit]
-
-    # Sort by date if requested
     sort_param = search_params.get("_sort", "")
+
     if sort_param:
+        # Sorted search: heap-select the top `limit` matches instead of
+        # materializing and fully sorting every match.
         reverse = sort_param.startswith("-")
-        sort_field = sort_param.lstrip("-")
-        matching_entries = _sort_entries(matching_entries, sort_field, reverse)
+        matches = [r for r in resources if _matches_search_params(r, search_params)]
+        select = heapq.nlargest if reverse else heapq.nsmallest
+        matching_entries = [
+            {"resource": resource}
+            for resource in select(limit, matches, key=_resource_date_key)
+        ]
+    else:
+        # Unsorted search: stop filtering as soon as the limit is hit
+        matching_entries = []
+        for resource in resources:
+            if _matches_search_params(resource, search_params):
+                matching_entries.append({"resource": resource})
+                if len(matching_entries) >= limit:
+                    break
 
     return {
         "resourceType": "Bundle",
@@ -121,10 +189,9 @@ def get_fhir_resource(resource_type: str, resource_id: str) -> dict:
     if resource_type == "Patient":
         bundle = load_patient_bundle(resource_id)
         if bundle:
-            for entry in bundle.get("entry", []):
-                resource = entry.get("resource", {})
-                if resource.get("resourceType") == "Patient":
-                    return resource
+            patients = index_bundle(bundle).get("Patient")
+            if patients:
+                return patients[0]
 
     # For other resources, we'd need to know which patient bundle to search
     # This is a limitation of file-based storage
@@ -132,18 +199,17 @@ def get_fhir_resource(resource_type: str, resource_id: str) -> dict:
 
 
 def _matches_search_params(resource: dict, params: dict) -> bool:
-    """Check if a resource matches the search parameters."""
-    # Category filter (e.g., 'laboratory', 'vital-signs')
-    category = params.get("category", "")
-    if category:
-        resource_categories = resource.get("category", [])
-        if isinstance(resource_categories, list):
-            category_codes = []
-            for cat in resource_categories:
-                for coding in cat.get("coding", []):
-                    category_codes.append(coding.get("code", "").lower())
-            if category.lower() not in category_codes:
-                return False
+    """Check if a resource matches the search parameters.
+
+    Filters run cheapest-first so non-matching resources are rejected
+    before the more expensive checks: a flat status compare, then the
+    code-text substring scan, then the nested category walk.
+    """
+    # Status filter
+    status = params.get("status", "")
+    if status:
+        if resource.get("status", "").lower() != status.lower():
+            return False
 
     # Code text filter
     code_text = params.get("code:text", "")
@@ -152,10 +218,23 @@ def _matches_search_params(resource: dict, params: dict) -> bool:
         if code_text.lower() not in resource_code:
             return False
 
-    # Status filter
-    status = params.get("status", "")
-    if status:
-        if resource.get("status", "").lower() != status.lower():
+    # Category filter (e.g., 'laboratory', 'vital-signs')
+    category = params.get("category", "")
+    if category:
+        # Memoize the flattened code set on the resource (same idiom as
+        # the bundle "_index") so repeated searches against a cached
+        # bundle don't re-walk the category/coding nesting every time.
+        category_codes = resource.get("_category_codes")
+        if category_codes is None:
+            resource_categories = resource.get("category", [])
+            if isinstance(resource_categories, list):
+                category_codes = frozenset(
+                    coding.get("code", "").lower()
+                    for cat in resource_categories
+                    for coding in cat.get("coding", [])
+                )
+                resource["_category_codes"] = category_codes
+        if category_codes is not None and category.lower() not in category_codes:
             return False
 
     # Date filters (simplified)
@@ -164,149 +243,212 @@ def _matches_search_params(resource: dict, params: dict) -> bool:
     return True
 
 
+# Common date fields checked when sorting entries, in priority order
+DATE_FIELDS = ("effectiveDateTime", "date", "issued", "authoredOn")
+
+
+def _resource_date_key(resource: dict) -> str:
+    """Date sort key for a resource: first known date field, else ''."""
+    for field in DATE_FIELDS:
+        if field in resource:
+            return resource[field]
+    return ""
+
+
 def _sort_entries(entries: list, sort_field: str, reverse: bool) -> list:
     """Sort entries by a field."""
-    def get_sort_key(entry):
-        resource = entry.get("resource", {})
-        # Common date fields
-        for field in ["effectiveDateTime", "date", "issued", "authoredOn"]:
-            if field in resource:
-                return resource[field]
-        return ""
-
-    return sorted(entries, key=get_sort_key, reverse=reverse)
+    # Precompute the sort key per entry once (decorate-sort), so the
+    # date-field probing runs N times instead of N log N times inside
+    # the comparison callback.
+    keys = [_resource_date_key(entry.get("resource", {})) for entry in entries]
+    order = sorted(range(len(entries)), key=keys.__getitem__, reverse=reverse)
+    return [entries[i] for i in order]
 
 
 # Helper functions for common FHIR operations
 
 def extract_observations(bundle: dict) -> list:
     """Extract observation data from a FHIR Bundle."""
+    return extract_observations_from_resources(index_bundle(bundle).get("Observation", []))
+
+
+def extract_observations_from_resources(resources) -> list:
+    """Extract observation data from already-filtered Observation resources.
+
+    Accepts any iterable of resource dicts, so callers that already hold
+    the resources (e.g. via search_resources) skip re-wrapping them into
+    a fake bundle and walking it a second time.
+    """
     observations = []
-    entries = bundle.get("entry", [])
-
-    for entry in entries:
-        resource = entry.get("resource", {})
-        if resource.get("resourceType") == "Observation":
-            # Extract category codes from FHIR structure
-            category_codes = []
-            for cat in resource.get("category", []):
-                for coding in cat.get("coding", []):
-                    code = coding.get("code", "")
-                    if code:
-                        category_codes.append(code)
-
-            obs = {
-                "code": resource.get("code", {}).get("text", "Unknown"),
-                "value": None,
-                "unit": None,
-                "effectiveDateTime": resource.get("effectiveDateTime", ""),
-                "status": resource.get("status", ""),
-                "category": category_codes,  # e.g., ["vital-signs"] or ["laboratory"]
-            }
-
-            # Extract value (can be valueQuantity, valueString, etc.)
-            if "valueQuantity" in resource:
-                obs["value"] = resource["valueQuantity"].get("value")
-                obs["unit"] = resource["valueQuantity"].get("unit", "")
-            elif "valueString" in resource:
-                obs["value"] = resource["valueString"]
-            elif "valueCodeableConcept" in resource:
-                obs["value"] = resource["valueCodeableConcept"].get("text", "")
-
-            # Extract reference ranges if available
-            if "referenceRange" in resource:
-                ref_range = resource["referenceRange"][0]
-                low = ref_range.get("low", {}).get("value", "")
-                high = ref_range.get("high", {}).get("value", "")
-                obs["reference_range"] = f"{low}-{high}" if low and high else ""
-
-            observations.append(obs)
+
+    for resource in resources:
+        # Extract category codes from FHIR structure
+        category_codes = []
+        for cat in resource.get("category", []):
+            for coding in cat.get("coding", []):
+                code = coding.get("code", "")
+                if code:
+                    category_codes.append(code)
+
+        obs = {
+            "code": resource.get("code", {}).get("text", "Unknown"),
+            "value": None,
+            "unit": None,
+            "effectiveDateTime": resource.get("effectiveDateTime", ""),
+            "status": resource.get("status", ""),
+            "category": category_codes,  # e.g., ["vital-signs"] or ["laboratory"]
+        }
+
+        # Extract value (can be valueQuantity, valueString, etc.)
+        if "valueQuantity" in resource:
+            obs["value"] = resource["valueQuantity"].get("value")
+            obs["unit"] = resource["valueQuantity"].get("unit", "")
+        elif "valueString" in resource:
+            obs["value"] = resource["valueString"]
+        elif "valueCodeableConcept" in resource:
+            obs["value"] = resource["valueCodeableConcept"].get("text", "")
+
+        # Extract reference ranges if available
+        if "referenceRange" in resource:
+            ref_range = resource["referenceRange"][0]
+            low = ref_range.get("low", {}).get("value", "")
+            high = ref_range.get("high", {}).get("value", "")
+            obs["reference_range"] = f"{low}-{high}" if low and high else ""
+
+        observations.append(obs)
 
     return observations
 
 
 def extract_conditions(bundle: dict) -> list:
     """Extract condition/diagnosis data from a FHIR Bundle."""
+    return extract_conditions_from_resources(index_bundle(bundle).get("Condition", []))
+
+
+def extract_conditions_from_resources(resources) -> list:
+    """Extract condition data from already-filtered Condition resources."""
     conditions = []
-    entries = bundle.get("entry", [])
-
-    for entry in entries:
-        resource = entry.get("resource", {})
-        if resource.get("resourceType") == "Condition":
-            condition = {
-                "name": "",
-                "code": "",
-                "system": "",
-                "clinical_status": "",
-                "verification_status": "",
-                "category": [],
-                "onset_date": "",
-                "abatement_date": "",
-                "recorded_date": resource.get("recordedDate", ""),
-            }
-
-            # Extract condition code and name
-            code_obj = resource.get("code", {})
-            condition["name"] = code_obj.get("text", "")
-            if "coding" in code_obj and code_obj["coding"]:
-                coding = code_obj["coding"][0]
-                condition["code"] = coding.get("code", "")
-                condition["system"] = coding.get("system", "")
-                if not condition["name"]:
-                    condition["name"] = coding.get("display", "")
-
-            # Extract clinical status
-            clinical_status = resource.get("clinicalStatus", {})
-            if "coding" in clinical_status and clinical_status["coding"]:
-                condition["clinical_status"] = clinical_status["coding"][0].get("code", "")
-
-            # Extract verification status
-            verification = resource.get("verificationStatus", {})
-            if "coding" in verification and verification["coding"]:
-                condition["verification_status"] = verification["coding"][0].get("code", "")
-
-            # Extract categories (primary, secondary, problem-list, etc.)
-            categories = resource.get("category", [])
-            for cat in categories:
-                if "coding" in cat:
-                    for coding in cat["coding"]:
-                        condition["category"].append(coding.get("code", ""))
-
-            # Extract onset date
-            if "onsetDateTime" in resource:
-                condition["onset_date"] = resource["onsetDateTime"]
-            elif "onsetPeriod" in resource:
-                condition["onset_date"] = resource["onsetPeriod"].get("start", "")
-
-            # Extract abatement (resolution) date
-            if "abatementDateTime" in resource:
-                condition["abatement_date"] = resource["abatementDateTime"]
-
-            conditions.append(condition)
+
+    for resource in resources:
+        get = resource.get
+
+        condition = {
+            "name": "",
+            "code": "",
+            "system": "",
+            "clinical_status": "",
+            "verification_status": "",
+            "category": [
+                coding.get("code", "")
+                for cat in get("category", [])
+                for coding in cat.get("coding", [])
+            ],
+            "onset_date": "",
+            "abatement_date": get("abatementDateTime", ""),
+            "recorded_date": get("recordedDate", ""),
+        }
+
+        # Extract condition code and name
+        code_obj = get("code", {})
+        condition["name"] = code_obj.get("text", "")
+        coding = code_obj.get("coding")
+        if coding:
+            primary = coding[0]
+            condition["code"] = primary.get("code", "")
+            condition["system"] = primary.get("system", "")
+            if not condition["name"]:
+                condition["name"] = primary.get("display", "")
+
+        # Extract clinical status
+        status_coding = get("clinicalStatus", {}).get("coding")
+        if status_coding:
+            condition["clinical_status"] = status_coding[0].get("code", "")
+
+        # Extract verification status
+        verification_coding = get("verificationStatus", {}).get("coding")
+        if verification_coding:
+            condition["verification_status"] = verification_coding[0].get("code", "")
+
+        # Extract onset date
+        if "onsetDateTime" in resource:
+            condition["onset_date"] = resource["onsetDateTime"]
+        elif "onsetPeriod" in resource:
+            condition["onset_date"] = resource["onsetPeriod"].get("start", "")
+
+        conditions.append(condition)
 
     return conditions
 
 
+def iter_condition_codes(bundle: dict):
+    """
+    Yield (code, clinical_status) per condition without building the
+    full condition dicts that extract_conditions assembles.
+
+    Args:
+        bundle: FHIR Bundle dict
+
+    Yields:
+        (code, clinical_status) string tuples, '' where absent
+    """
+    for resource in index_bundle(bundle).get("Condition", []):
+        coding = resource.get("code", {}).get("coding")
+        code = coding[0].get("code", "") if coding else ""
+
+        status_coding = resource.get("clinicalStatus", {}).get("coding")
+        clinical_status = status_coding[0].get("code", "") if status_coding else ""
+
+        yield code, clinical_status
+
+
+def extract_condition_codes(bundle: dict) -> set:
+    """
+    Collect the set of condition codes present in a FHIR Bundle.
+
+    Fast path for consumers that only match on codes (e.g. clinical
+    score extraction): skips building the full per-condition dicts that
+    extract_conditions assembles.
+
+    Args:
+        bundle: FHIR Bundle dict
+
+    Returns:
+        set of condition code strings (primary coding per condition)
+    """
+    codes = set()
+    for resource in index_bundle(bundle).get("Condition", []):
+        coding = resource.get("code", {}).get("coding")
+        if coding:
+            code = coding[0].get("code", "")
+            if code:
+                # Interned to match the interned SNOMED lookup tables in
+                # clinical.scores (pointer-equality dict hits)
+                codes.add(sys.intern(code))
+    return codes
+
+
 def extract_medications(bundle: dict) -> list:
     """Extract medication data from a FHIR Bundle."""
+    return extract_medications_from_resources(index_bundle(bundle).get("MedicationRequest", []))
+
+
+def extract_medications_from_resources(resources) -> list:
+    """Extract medication data from already-filtered MedicationRequest resources."""
     medications = []
-    entries = bundle.get("entry", [])
-
-    for entry in entries:
-        resource = entry.get("resource", {})
-        if resource.get("resourceType") == "MedicationRequest":
-            med = {
-                "medication": resource.get("medicationCodeableConcept", {}).get("text", "Unknown"),
-                "status": resource.get("status", ""),
-                "authoredOn": resource.get("authoredOn", ""),
-                "dosageInstruction": "",
-            }
-
-            # Extract dosage
-            if "dosageInstruction" in resource and resource["dosageInstruction"]:
-                dosage = resource["dosageInstruction"][0]
-                med["dosageInstruction"] = dosage.get("text", "")
-
-            medications.append(med)
+
+    for resource in resources:
+        med = {
+            "medication": resource.get("medicationCodeableConcept", {}).get("text", "Unknown"),
+            "status": resource.get("status", ""),
+            "authoredOn": resource.get("authoredOn", ""),
+            "dosageInstruction": "",
+        }
+
+        # Extract dosage
+        if "dosageInstruction" in resource and resource["dosageInstruction"]:
+            dosage = resource["dosageInstruction"][0]
+            med["dosageInstruction"] = dosage.get("text", "")
+
+        medications.append(med)
 
     return medications
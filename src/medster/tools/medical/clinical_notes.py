@@ -1,8 +1,44 @@
+import re
+
 from langchain.tools import tool
 from typing import Literal, Optional
 from pydantic import BaseModel, Field
 from medster.tools.medical.api import search_fhir
 
+# SOAP section headers, matched in one compiled-regex pass instead of a
+# separate full-text substring scan per header; extending the taxonomy
+# (ROS, HPI, etc.) just means adding alternatives here. Case folding is
+# done by the regex engine in place, so the note body is never copied.
+_SOAP_HEADER_RE = re.compile(r"(subjective|objective|assessment|plan):", re.IGNORECASE)
+
+# Map common note types to LOINC document types
+NOTE_TYPE_MAP = {
+    "progress-note": "11506-3",
+    "discharge-summary": "18842-5",
+    "consultation": "11488-4",
+    "history-physical": "34117-2",
+    "operative-note": "11504-8",
+}
+
+# pybase64 decodes with SIMD (roughly 10x the stdlib throughput on large
+# inline note bodies); it is optional, not a declared dependency
+try:
+    from pybase64 import b64decode as _b64decode
+except ImportError:
+    from base64 import b64decode as _b64decode
+
+
+def _decode_attachment(data: str) -> str:
+    """Decode a base64 DocumentReference attachment to text."""
+    try:
+        # validate=True takes the fast path that skips pre-scrubbing
+        raw = _b64decode(data, validate=True)
+    except Exception:
+        # Stray whitespace/padding: retry on the lenient scrubbing path
+        raw = _b64decode(data)
+    return raw.decode("utf-8", errors="ignore")
+
+
 ####################################
 # Input Schemas
 ####################################
@@ -63,16 +99,9 @@ def get_clinical_notes(
 
     # Add note type filter
     if note_type:
-        # Map common note types to LOINC document types
-        note_type_map = {
-            "progress-note": "11506-3",
-            "discharge-summary": "18842-5",
-            "consultation": "11488-4",
-            "history-physical": "34117-2",
-            "operative-note": "11504-8",
-        }
-        if note_type in note_type_map:
-            params["type"] = note_type_map[note_type]
+        loinc_code = NOTE_TYPE_MAP.get(note_type)
+        if loinc_code:
+            params["type"] = loinc_code
         else:
             params["type:text"] = note_type
 
@@ -98,8 +127,7 @@ def get_clinical_notes(
                     if "attachment" in content_item:
                         attachment = content_item["attachment"]
                         if "data" in attachment:
-                            import base64
-                            note["content"] = base64.b64decode(attachment["data"]).decode("utf-8", errors="ignore")
+                            note["content"] = _decode_attachment(attachment["data"])
                         elif "url" in attachment:
                             note["content"] = f"[Content available at: {attachment['url']}]"
 
@@ -170,20 +198,13 @@ def get_soap_notes(
                 if "content" in resource and resource["content"]:
                     content_item = resource["content"][0]
                     if "attachment" in content_item and "data" in content_item["attachment"]:
-                        import base64
-                        text = base64.b64decode(content_item["attachment"]["data"]).decode("utf-8", errors="ignore")
+                        text = _decode_attachment(content_item["attachment"]["data"])
                         note["full_text"] = text
 
                         # Simple parsing for SOAP sections (can be enhanced)
-                        text_lower = text.lower()
-                        if "subjective:" in text_lower:
-                            note["subjective"] = "[Subjective section found]"
-                        if "objective:" in text_lower:
-                            note["objective"] = "[Objective section found]"
-                        if "assessment:" in text_lower:
-                            note["assessment"] = "[Assessment section found]"
-                        if "plan:" in text_lower:
-                            note["plan"] = "[Plan section found]"
+                        for match in _SOAP_HEADER_RE.finditer(text):
+                            section = match.group(1).lower()
+                            note[section] = f"[{section.capitalize()} section found]"
 
                 soap_notes.append(note)
 
@@ -250,8 +271,7 @@ def get_discharge_summary(
             if "content" in resource and resource["content"]:
                 content_item = resource["content"][0]
                 if "attachment" in content_item and "data" in content_item["attachment"]:
-                    import base64
-                    text = base64.b64decode(content_item["attachment"]["data"]).decode("utf-8", errors="ignore")
+                    text = _decode_attachment(content_item["attachment"]["data"])
                     discharge_summary["full_text"] = text
 
         return {
@@ -1,7 +1,46 @@
+import re
+
 from langchain.tools import tool
 from typing import Optional
 from pydantic import BaseModel, Field
-from medster.tools.medical.api import search_fhir, extract_medications
+from medster.tools.medical.api import search_fhir, extract_medications, load_patient_bundle
+
+# Common high-risk drug interaction patterns (simplified), frozen at
+# import: tuple of (side-1 patterns, side-2 patterns, warning)
+# In production, this would call a drug interaction API like DrugBank or Medscape
+HIGH_RISK_COMBINATIONS = tuple(
+    (frozenset(side1), frozenset(side2), warning)
+    for side1, side2, warning in [
+        (["warfarin"], ["aspirin", "ibuprofen", "naproxen"], "Increased bleeding risk"),
+        (["metformin"], ["contrast dye"], "Risk of lactic acidosis"),
+        (["ssri", "sertraline", "fluoxetine"], ["tramadol", "maoi"], "Risk of serotonin syndrome"),
+        (["ace inhibitor", "lisinopril", "enalapril"], ["potassium", "spironolactone"], "Risk of hyperkalemia"),
+        (["digoxin"], ["amiodarone"], "Digoxin toxicity risk"),
+        (["statin", "atorvastatin", "simvastatin"], ["gemfibrozil"], "Risk of rhabdomyolysis"),
+    ]
+)
+
+# One multi-pattern scanner over every interaction pattern: each
+# medication name is scanned once regardless of how many rules the
+# table grows to, instead of testing every pattern of every rule
+# against every name. Longest alternatives first so e.g.
+# "atorvastatin" wins over its "statin" substring.
+_DRUG_PATTERN_RULES = {}
+for _idx, (_side1, _side2, _warning) in enumerate(HIGH_RISK_COMBINATIONS):
+    for _pattern in _side1:
+        _DRUG_PATTERN_RULES.setdefault(_pattern, []).append((_idx, 1))
+    for _pattern in _side2:
+        _DRUG_PATTERN_RULES.setdefault(_pattern, []).append((_idx, 2))
+
+_DRUG_PATTERN_RE = re.compile(
+    "|".join(re.escape(p) for p in sorted(_DRUG_PATTERN_RULES, key=len, reverse=True))
+)
+
+
+def _match_drug_rules(med_lower: str):
+    """Yield (rule_index, side) for each interaction pattern in a name."""
+    for match in _DRUG_PATTERN_RE.finditer(med_lower):
+        yield from _DRUG_PATTERN_RULES[match.group()]
 
 ####################################
 # Input Schemas
@@ -44,6 +83,14 @@ def get_medication_list(
         params["status"] = "active"
 
     try:
+        # Both searches below resolve against the same patient bundle;
+        # loading it into the LRU cache once up front means the only
+        # I/O (file read or GCS download) happens a single time and the
+        # two searches are in-memory index scans. Running them in
+        # threads instead would race both to a cold-cache miss and
+        # parse the bundle twice.
+        load_patient_bundle(patient_id)
+
         bundle = search_fhir("MedicationRequest", **params)
         medications = extract_medications(bundle)
 
@@ -107,54 +154,42 @@ def check_drug_interactions(
 
         current_meds = [med["medication"] for med in medications]
 
-        # Common high-risk drug interaction patterns (simplified)
-        # In production, this would call a drug interaction API like DrugBank or Medscape
-        high_risk_combinations = [
-            (["warfarin"], ["aspirin", "ibuprofen", "naproxen"], "Increased bleeding risk"),
-            (["metformin"], ["contrast dye"], "Risk of lactic acidosis"),
-            (["ssri", "sertraline", "fluoxetine"], ["tramadol", "maoi"], "Risk of serotonin syndrome"),
-            (["ace inhibitor", "lisinopril", "enalapril"], ["potassium", "spironolactone"], "Risk of hyperkalemia"),
-            (["digoxin"], ["amiodarone"], "Digoxin toxicity risk"),
-            (["statin", "atorvastatin", "simvastatin"], ["gemfibrozil"], "Risk of rhabdomyolysis"),
-        ]
+        # Scan each medication name once, collecting which rule sides it
+        # satisfies; the last matching med wins per side, as before
+        rule_hits = {}
+        for med in current_meds:
+            for rule_idx, side in _match_drug_rules(med.lower()):
+                rule_hits.setdefault(rule_idx, {})[side] = med
+
+        # Sides of each rule the new medication matches, if provided
+        new_med_sides = {}
+        if new_medication:
+            for rule_idx, side in _match_drug_rules(new_medication.lower()):
+                new_med_sides.setdefault(rule_idx, set()).add(side)
 
         interactions_found = []
 
-        # Check current medications against each other
-        for med1_patterns, med2_patterns, warning in high_risk_combinations:
-            found_med1 = None
-            found_med2 = None
-
-            for med in current_meds:
-                med_lower = med.lower()
-                for pattern in med1_patterns:
-                    if pattern in med_lower:
-                        found_med1 = med
-                        break
-                for pattern in med2_patterns:
-                    if pattern in med_lower:
-                        found_med2 = med
-                        break
-
-            # Check new medication if provided
+        for rule_idx, (_, _, warning) in enumerate(HIGH_RISK_COMBINATIONS):
+            hits = rule_hits.get(rule_idx, {})
+            found_med1 = hits.get(1)
+            found_med2 = hits.get(2)
+
             if new_medication:
-                new_med_lower = new_medication.lower()
-                for pattern in med1_patterns:
-                    if pattern in new_med_lower and found_med2:
-                        interactions_found.append({
-                            "medication_1": new_medication,
-                            "medication_2": found_med2,
-                            "warning": warning,
-                            "severity": "HIGH"
-                        })
-                for pattern in med2_patterns:
-                    if pattern in new_med_lower and found_med1:
-                        interactions_found.append({
-                            "medication_1": found_med1,
-                            "medication_2": new_medication,
-                            "warning": warning,
-                            "severity": "HIGH"
-                        })
+                sides = new_med_sides.get(rule_idx, ())
+                if 1 in sides and found_med2:
+                    interactions_found.append({
+                        "medication_1": new_medication,
+                        "medication_2": found_med2,
+                        "warning": warning,
+                        "severity": "HIGH"
+                    })
+                if 2 in sides and found_med1:
+                    interactions_found.append({
+                        "medication_1": found_med1,
+                        "medication_2": new_medication,
+                        "warning": warning,
+                        "severity": "HIGH"
+                    })
             elif found_med1 and found_med2:
                 interactions_found.append({
                     "medication_1": found_med1,
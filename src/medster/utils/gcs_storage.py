@@ -8,12 +8,27 @@ whether stored locally or in GCS.
 import os
 import json
 import logging
+from collections import OrderedDict
 from pathlib import Path
 from typing import Optional, List, Dict, Any
 from functools import lru_cache
 
 logger = logging.getLogger(__name__)
 
+# orjson parses the multi-MB FHIR bundles several times faster than the
+# stdlib json module; it is optional, not a declared dependency
+try:
+    import orjson as _orjson
+except ImportError:
+    _orjson = None
+
+
+def _parse_json_bytes(data: bytes) -> dict:
+    """Decode a JSON document from bytes with orjson when available."""
+    if _orjson is not None:
+        return _orjson.loads(data)
+    return json.loads(data)
+
 # GCS Configuration
 GCS_BUCKET_NAME = os.getenv("GCS_COHERENT_BUCKET", "medster-coherent-data")
 USE_GCS = os.getenv("USE_GCS", "false").lower() == "true"
@@ -28,12 +43,36 @@ LOCAL_DNA_PATH = os.getenv("COHERENT_DNA_PATH", "./coherent_data/dna")
 _gcs_client = None
 _gcs_bucket = None
 
-# In-memory cache for frequently accessed data
-_patient_cache: Dict[str, dict] = {}
+# In-memory cache for frequently accessed data. The patient cache is a
+# bounded LRU: bundles run to several MB each, so an unbounded dict
+# would grow without limit over a long agent session.
+_PATIENT_CACHE_MAX = 256
+_patient_cache: "OrderedDict[str, dict]" = OrderedDict()
 _patient_list_cache: Optional[List[str]] = None
 _csv_cache: Dict[str, Any] = {}
 
 
+def _cache_patient_bundle(patient_id: str, bundle: dict) -> None:
+    """Insert a bundle into the LRU cache, evicting the oldest entry."""
+    _patient_cache[patient_id] = bundle
+    _patient_cache.move_to_end(patient_id)
+    while len(_patient_cache) > _PATIENT_CACHE_MAX:
+        _patient_cache.popitem(last=False)
+
+
+def _get_cached_patient_bundle(patient_id: str) -> Optional[dict]:
+    """Fetch a cached bundle, refreshing its LRU position on a hit."""
+    bundle = _patient_cache.get(patient_id)
+    if bundle is not None:
+        _patient_cache.move_to_end(patient_id)
+    return bundle
+
+
+def clear_patient_cache() -> None:
+    """Drop cached patient bundles (e.g. after new data is uploaded)."""
+    _patient_cache.clear()
+
+
 def get_gcs_client():
     """Get or create GCS client (lazy initialization)."""
     global _gcs_client, _gcs_bucket
@@ -63,8 +102,9 @@ def load_patient_bundle_gcs(patient_id: str) -> Optional[dict]:
         FHIR Bundle dict or None if not found
     """
     # Check cache first
-    if patient_id in _patient_cache:
-        return _patient_cache[patient_id]
+    cached = _get_cached_patient_bundle(patient_id)
+    if cached is not None:
+        return cached
 
     client, bucket = get_gcs_client()
     if not bucket:
@@ -76,9 +116,11 @@ def load_patient_bundle_gcs(patient_id: str) -> Optional[dict]:
 
         for blob in blobs:
             if patient_id in blob.name and blob.name.endswith('.json'):
-                content = blob.download_as_text()
-                bundle = json.loads(content)
-                _patient_cache[patient_id] = bundle
+                # Bytes skip the text-decode pass; the parser handles
+                # UTF-8 input directly
+                content = blob.download_as_bytes()
+                bundle = _parse_json_bytes(content)
+                _cache_patient_bundle(patient_id, bundle)
                 return bundle
 
         return None
@@ -98,8 +140,9 @@ def load_patient_bundle_local(patient_id: str) -> Optional[dict]:
         FHIR Bundle dict or None if not found
     """
     # Check cache first
-    if patient_id in _patient_cache:
-        return _patient_cache[patient_id]
+    cached = _get_cached_patient_bundle(patient_id)
+    if cached is not None:
+        return cached
 
     data_path = Path(LOCAL_FHIR_PATH)
     if not data_path.exists():
@@ -114,10 +157,9 @@ def load_patient_bundle_local(patient_id: str) -> Optional[dict]:
     for pattern in patterns:
         matches = list(data_path.glob(pattern))
         if matches:
-            with open(matches[0], 'r') as f:
-                bundle = json.load(f)
-                _patient_cache[patient_id] = bundle
-                return bundle
+            bundle = _parse_json_bytes(matches[0].read_bytes())
+            _cache_patient_bundle(patient_id, bundle)
+            return bundle
 
     return None
 
@@ -142,6 +184,60 @@ def load_patient_bundle(patient_id: str) -> Optional[dict]:
     return load_patient_bundle_local(patient_id)
 
 
+def open_fhir_file_gcs(patient_id: str):
+    """Open a patient's FHIR bundle in GCS for streaming binary reads."""
+    client, bucket = get_gcs_client()
+    if not bucket:
+        return None
+
+    try:
+        blobs = list(bucket.list_blobs(prefix="fhir/", max_results=2000))
+        for blob in blobs:
+            if patient_id in blob.name and blob.name.endswith('.json'):
+                return blob.open("rb", chunk_size=1 << 20)
+        return None
+    except Exception as e:
+        logger.error(f"Error opening FHIR stream for {patient_id} from GCS: {e}")
+        return None
+
+
+def open_fhir_file_local(patient_id: str):
+    """Open a patient's FHIR bundle on the local filesystem for binary reads."""
+    data_path = Path(LOCAL_FHIR_PATH)
+    if not data_path.exists():
+        return None
+
+    for pattern in (f"{patient_id}.json", f"*{patient_id}*.json"):
+        matches = list(data_path.glob(pattern))
+        if matches:
+            return matches[0].open("rb")
+
+    return None
+
+
+def open_fhir_file(patient_id: str):
+    """
+    Open a patient's FHIR bundle for streaming reads (GCS or local).
+
+    Unlike load_patient_bundle, nothing is parsed or cached here: the
+    raw bytes stream to the caller, which keeps peak memory at one
+    chunk for incremental decoders. The caller must close the returned
+    file object.
+
+    Args:
+        patient_id: Patient ID or partial filename match
+
+    Returns:
+        Binary-mode file object or None
+    """
+    if USE_GCS:
+        fileobj = open_fhir_file_gcs(patient_id)
+        if fileobj is not None:
+            return fileobj
+
+    return open_fhir_file_local(patient_id)
+
+
 def list_patients_gcs(limit: Optional[int] = None) -> List[str]:
     """List available patient IDs from GCS."""
     global _patient_list_cache
@@ -271,6 +367,55 @@ def load_csv_file(filename: str) -> Optional[str]:
     return content
 
 
+def stream_csv_file_gcs(filename: str):
+    """Open a CSV file in GCS for streaming text reads."""
+    client, bucket = get_gcs_client()
+    if not bucket:
+        return None
+
+    try:
+        # Handle nested path from upload
+        blob = bucket.blob(f"csv/csv/{filename}")
+        if not blob.exists():
+            blob = bucket.blob(f"csv/{filename}")
+
+        return blob.open("rt", chunk_size=1 << 20)
+    except Exception as e:
+        logger.error(f"Error opening CSV stream {filename} from GCS: {e}")
+        return None
+
+
+def stream_csv_file_local(filename: str):
+    """Open a CSV file on the local filesystem for streaming text reads."""
+    csv_path = Path(LOCAL_CSV_PATH) / filename
+    if csv_path.exists():
+        return csv_path.open("rt")
+    return None
+
+
+def stream_csv_file(filename: str):
+    """
+    Open a CSV file for streaming reads (auto-selects GCS or local).
+
+    Unlike load_csv_file, the content is never materialized as one
+    string: rows are parsed as they arrive, so peak memory stays at one
+    chunk even for the multi-hundred-MB observations.csv. The caller is
+    responsible for closing the returned file object.
+
+    Args:
+        filename: CSV filename (e.g., 'observations.csv')
+
+    Returns:
+        Text-mode file object or None
+    """
+    if USE_GCS:
+        fileobj = stream_csv_file_gcs(filename)
+        if fileobj is not None:
+            return fileobj
+
+    return stream_csv_file_local(filename)
+
+
 def load_dicom_file_gcs(filename: str) -> Optional[bytes]:
     """Load a DICOM file from GCS."""
     client, bucket = get_gcs_client()
@@ -474,11 +619,14 @@ def convert_dicom_to_png_from_gcs(filename: str, target_size: tuple = (800, 800)
         # Convert to PIL Image
         img = Image.fromarray(pixel_array)
 
-        # Convert to RGB if grayscale
-        if img.mode != 'RGB':
-            img = img.convert('RGB')
+        # Keep single-channel data as 8-bit grayscale - 3x fewer bytes
+        # than RGB and Claude's vision encoder handles 'L' PNGs fine
+        if img.mode not in ('L', 'RGB'):
+            img = img.convert('L')
 
-        # Resize for token efficiency
+        # Resize for token efficiency, capped at Claude's vision tiling limit
+        from medster.utils.image_utils import CLAUDE_MAX_EDGE
+        target_size = (min(target_size[0], CLAUDE_MAX_EDGE), min(target_size[1], CLAUDE_MAX_EDGE))
         img.thumbnail(target_size, Image.Resampling.LANCZOS)
 
         # Convert to base64 PNG